@@ -1,9 +1,12 @@
 import asyncio
 import sys
+import time
 import traceback
-from typing import ClassVar
+from collections import Counter, deque
+from collections.abc import Awaitable, Callable, Iterable
+from dataclasses import dataclass
+from functools import partial
 
-import dolphin_memory_engine as dme
 import Utils
 from CommonClient import (
     ClientCommandProcessor,
@@ -17,42 +20,55 @@ from CommonClient import (
 from MultiServer import mark_raw
 
 from .addresses import *  # noqa: F403
+from .backends import BACKENDS, GAME_ID, MEM1_ADDRESS, RetryBackend
 from .bit_helper import (
+    apply_flag_patch,
+    compile_flag_patch,
     extract_bitflag_list,
-    extract_bits_value,
-    get_bit_address,
+    read_flag_bit,
     read_value_bytes,
     set_flag_bit,
-    set_on_or_bytes,
     set_value_bytes,
-    swap_endian,
 )
 from .items import (
+    ALL_ITEMS_TABLE,
     FILLER_ITEMS,
     ITEM_INVENTORY,
     ITEM_STAFF,
     ITEM_TRICKY,
+    ITEMS_BY_ID,
+    PROGRESSION_ITEMS,
     USEFUL_ITEMS,
     SFAConsumableItemData,
     SFACountItemData,
     SFAItemData,
-    SFAItemType,
     SFAPlanetItemData,
     SFAProgressiveItemData,
     SFAQuestItemData,
 )
+from .journal import SlotJournal, SlotState
 from .locations import (
+    LINKED_LOCATIONS_BY_ITEM,
+    LOCATIONS_BY_ID,
     LOCATION_ANY,
     LOCATION_SHOP,
     LOCATION_UPGRADE,
     NORMAL_TABLES,
     SFACountLocationData,
-    SFALinkedLocationData,
     SFALocationData,
     SFALocationType,
     SFAShopLocationData,
     SFAUpgradeLocationData,
+    location_byte_addresses,
 )
+from .location_checks import LocationChecks
+from .memory import SHADOW
+from .memory_worker import PRIORITY_DELIVERY, PRIORITY_FLAGS, PRIORITY_LOCATIONS, MemoryWorker
+from .metrics import METRICS_FORMATS, MetricsExporter, MetricsSnapshot
+from .outbox import Outbox
+from .perf import PerfStats, RollingStats
+from .scheduler import ScheduledTask, TickScheduler
+from .transitions import TransitionBus
 
 TRACKER_LOADED = False
 # try:
@@ -61,17 +77,117 @@ TRACKER_LOADED = False
 # except ModuleNotFoundError:
 
 CONNECTION_REFUSED_GAME_STATUS = (
-    "Dolphin failed to connect. Please load a Star Fox Adventures ROM. Trying again in 5 seconds..."
-)
-CONNECTION_REFUSED_SAVE_STATUS = (
-    "Dolphin failed to connect. Please load into the save file. Trying again in 5 seconds..."
+    "Dolphin failed to connect. Please load a Star Fox Adventures ROM. Retrying automatically..."
 )
+CONNECTION_REFUSED_SAVE_STATUS = "Dolphin failed to connect. Please load into the save file. Retrying automatically..."
 CONNECTION_LOST_STATUS = (
     "Dolphin connection was lost. Please restart your emulator and make sure Star Fox Adventures is running."
 )
 CONNECTION_CONNECTED_STATUS = "Dolphin connected successfully."
 CONNECTION_INITIAL_STATUS = "Dolphin connection has not been initiated."
 
+#: Seconds before the first reconnection attempt, doubled after each failure
+RECONNECT_MIN_DELAY = 0.1
+#: Maximum seconds between two reconnection attempts
+RECONNECT_MAX_DELAY = 3.0
+#: Seconds between two checks for a starting Dolphin
+DOLPHIN_POLL_INTERVAL = 0.25
+#: Consecutive failed ticks before Dolphin is hooked again
+MAX_TICK_ERRORS = 3
+#: Number of reattach times kept
+REATTACH_HISTORY = 100
+
+#: Seconds a whole tick may take before it is counted as an overrun
+TICK_BUDGET = 0.1
+#: Backend functions reading or writing memory
+BACKEND_READS = ("read_bytes", "read_byte", "read_spans")
+BACKEND_WRITES = ("write_bytes", "write_spans")
+
+#: Folder of the slot state journals, in the user folder
+JOURNAL_FOLDER = "sfa_journal"
+
+#: Number of delivered items kept in the delivery latency history
+DELIVERY_LATENCY_HISTORY = 1000
+#: Item ID of the Victory item, it has no effect in game
+VICTORY_ITEM_ID = PROGRESSION_ITEMS["Victory"].id
+
+#: Flags forced when starting a save
+STARTING_PATCH = compile_flag_patch(
+    STARTING_FLAGS, [(ITEM_MAP_ADDRESS, ITEM_MAP_INIT_VALUE, 3), (SKIP_TUTO_ADDRESS, SKIP_TUTO_VALUE, 2)]
+)
+#: Flags forced on every tick
+CONSTANT_PATCH = compile_flag_patch(CONSTANT_FLAGS)
+
+
+def _watched_regions() -> list[tuple[int, int]]:
+    """
+    List all memory regions read by the client each tick.
+
+    :return: List of (address, size) regions
+    """
+    regions = [
+        (MAP_ID_ADDRESS, 1),
+        (CURRENT_SEQ_ADDRESS, 1),
+        (MAGIC_CAVE_ACT_ADDRESS, 1),
+        (MAGIC_CAVE_FLAG_ADDRESS, 4),
+        (DIM_OBJECTS_ADDRESS, 4),
+        (DIM2_OBJECTS_ADDRESS, 4),
+        (DINO_CAVE.table_address + DINO_CAVE.bit_offset // 8, 1),
+    ]
+    regions.extend((address, 1) for address, _, _ in (*STARTING_PATCH, *CONSTANT_PATCH))
+    for location in [*NORMAL_TABLES.values(), *LOCATION_UPGRADE.values(), *LOCATION_SHOP.values()]:
+        regions.extend((address, 1) for address in location_byte_addresses(location))
+    for item in ALL_ITEMS_TABLE.values():
+        if isinstance(item, SFAQuestItemData):
+            regions.append((item.table_address + item.item_used_flag_offset // 8, 2))
+        elif isinstance(item, SFAConsumableItemData):
+            regions.append((item.table_address, 1))
+            regions.append((item.max_read_address, 1))
+    return regions
+
+
+SHADOW.watch(_watched_regions())
+LOCATION_CHECKS = LocationChecks(NORMAL_TABLES.values(), SHADOW)
+
+
+@dataclass(frozen=True)
+class JobState:
+    """
+    Client state read by memory jobs, copied on the event loop when the job is submitted.
+
+    Jobs run on the memory worker thread, they only read this copy and return their results, which are applied to
+    the context back on the event loop.
+    """
+
+    #: Location IDs existing on the server
+    server_locations: frozenset[int]
+    #: Location IDs confirmed by the server
+    checked_locations: frozenset[int]
+    #: Location IDs checked in game
+    locations_checked: frozenset[int]
+    #: Number of each item ID delivered to the game
+    received_items_id: Counter[int]
+    #: Last map and DIM zone seen
+    stored_map: int
+    stored_dim: int
+
+
+def _job_state(ctx: "SFAContext") -> JobState:
+    """
+    Copy the client state read by memory jobs.
+
+    :param ctx: The Star Fox Adventures context
+    :return: State copy
+    """
+    return JobState(
+        frozenset(ctx.server_locations),
+        frozenset(ctx.checked_locations),
+        frozenset(ctx.locations_checked),
+        Counter(ctx.received_items_id),
+        ctx.stored_map,
+        ctx.stored_dim,
+    )
+
 
 class SFACommandProcessor(ClientCommandProcessor):
     """
@@ -99,9 +215,147 @@ class SFACommandProcessor(ClientCommandProcessor):
             self.ctx.sync_task = asyncio.create_task(sync_full_player_state(self.ctx))
             logger.info("Player state synchronized with server state.")
         else:
-            return _give_item_in_game(self.ctx, SFAItemData.get_by_name(name))
+            item = SFAItemData.get_by_name(name)
+            if item is None:
+                logger.error("Item not found in data.")
+                return False
+            self.ctx.sync_task = asyncio.create_task(sync_item_state(self.ctx, name, item))
         return True
 
+    def _cmd_perf(self) -> None:
+        """Display tick timings, memory accesses and item delivery latency."""
+        _log_perf(self.ctx)
+
+    def _cmd_dolphin(self) -> None:
+        """Display the Dolphin connection status."""
+        logger.info(f"Dolphin status: {self.ctx.dolphin_status}")
+        reattach_times = self.ctx.reattach_times
+        if reattach_times.count:
+            logger.info(
+                f"Reattached {reattach_times.count} times, last in {reattach_times.samples[-1]:.2f} s, "
+                f"slowest in {reattach_times.maximum:.2f} s"
+            )
+
+
+def _log_perf(ctx: "SFAContext") -> None:
+    """
+    Log a summary of the client performance.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    perf = ctx.perf
+    logger.info(f"Ticks: {perf.get('tick').summary()}, {ctx.tick_overruns} over {TICK_BUDGET * 1000:.0f} ms")
+    logger.info(f"  refresh: {perf.get('refresh').summary()}")
+    for task in ctx.scheduler.tasks:
+        logger.info(f"  {task.name}: {task.durations.summary()}, {task.overruns} over {task.budget * 1000:.0f} ms")
+    logger.info(f"  commit: {perf.get('commit').summary()}")
+    logger.info(f"Backend reads per tick: {perf.get('reads').summary(1, 'calls', 0)}")
+    logger.info(f"Backend writes per tick: {perf.get('writes').summary(1, 'calls', 0)}")
+    backend = SHADOW.backend
+    if isinstance(backend, RetryBackend):
+        for name, stats in sorted(backend.stats.stats.items()):
+            logger.info(f"  {name}: {stats.summary()}")
+        logger.info(f"  transient errors: {backend.transient_errors}")
+    latencies = RollingStats()
+    for _, latency in list(ctx.delivery_latencies):
+        latencies.add(latency)
+    logger.info(f"Item delivery latency: {latencies.summary()}")
+    logger.info("Location check latency, from detection to send:")
+    for name, stats in sorted(ctx.check_latency.stats.items()):
+        logger.info(f"  {name}: {stats.summary()}")
+    logger.info(f"  detection to send queue: {perf.get('check_queue').summary()}")
+    logger.info(f"  send queue to socket: {perf.get('check_send').summary()}")
+    logger.info(f"Forced flags changed back by the game: {ctx.flag_drift}")
+
+
+def _collect_metrics(ctx: "SFAContext") -> MetricsSnapshot:
+    """
+    Take a snapshot of the client metrics.
+
+    :param ctx: The Star Fox Adventures context
+    :return: Metric values
+    """
+    snapshot = MetricsSnapshot()
+    snapshot.add_stats("sfa_tick_seconds", ctx.perf.get("tick"), "Duration of game watcher ticks")
+    snapshot.add("sfa_tick_overruns_total", ctx.tick_overruns, "counter", "Ticks longer than the tick budget")
+    for stage in ("refresh", "commit"):
+        snapshot.add_stats("sfa_stage_seconds", ctx.perf.get(stage), "Duration of tick stages", stage=stage)
+    for task in ctx.scheduler.tasks:
+        snapshot.add_stats("sfa_stage_seconds", task.durations, "Duration of tick stages", stage=task.name)
+    for task in ctx.scheduler.tasks:
+        snapshot.add("sfa_stage_overruns_total", task.overruns, "counter", "Stage runs over budget", stage=task.name)
+    snapshot.add_stats("sfa_backend_reads_per_tick", ctx.perf.get("reads"), "Memory read calls per tick")
+    snapshot.add_stats("sfa_backend_writes_per_tick", ctx.perf.get("writes"), "Memory write calls per tick")
+    backend = SHADOW.backend
+    if isinstance(backend, RetryBackend):
+        for name, stats in sorted(backend.stats.stats.items()):
+            snapshot.add_stats("sfa_backend_call_seconds", stats, "Duration of memory calls", call=name)
+        snapshot.add("sfa_backend_transient_errors_total", backend.transient_errors, "counter", "Memory calls retried")
+    latencies = RollingStats()
+    for _, latency in list(ctx.delivery_latencies):
+        latencies.add(latency)
+    snapshot.add_stats("sfa_item_delivery_seconds", latencies, "Item delivery latency, last delivered items")
+    for name, stats in sorted(ctx.check_latency.stats.items()):
+        snapshot.add_stats("sfa_location_check_seconds", stats, "Location check latency, detection to send", type=name)
+    for phase in ("queue", "send"):
+        snapshot.add_stats(
+            "sfa_location_check_phase_seconds", ctx.perf.get(f"check_{phase}"), "Location check phases", phase=phase
+        )
+    snapshot.add(
+        "sfa_items_pending",
+        max(0, len(ctx.items_received) - ctx.expected_idx),
+        "gauge",
+        "Received items not delivered yet",
+    )
+    snapshot.add(
+        "sfa_dolphin_connected",
+        int(ctx.dolphin_status == CONNECTION_CONNECTED_STATUS),
+        "gauge",
+        "Connected to Dolphin",
+    )
+    snapshot.add_stats("sfa_dolphin_reattach_seconds", ctx.reattach_times, "Time to reattach to Dolphin")
+    snapshot.add("sfa_flag_drift_total", ctx.flag_drift, "counter", "Forced flag bytes changed back by the game")
+    return snapshot
+
+
+class CutsceneDeferral:
+    """
+    Actions held back while a cutscene plays.
+
+    Deferred actions are released in the first tick where no cutscene plays, so the rest of the tick keeps running.
+    """
+
+    def __init__(self):
+        """Initialize with no deferred action."""
+        self._actions: dict[str, Callable[[], Awaitable[None]]] = {}
+        self._held = False
+
+    def defer(self, key: str, action: Callable[[], Awaitable[None]]) -> None:
+        """
+        Defer an action, replacing any action deferred under the same key.
+
+        :param key: Key of the action
+        :param action: Coroutine function to run once released
+        """
+        self._actions[key] = action
+
+    def hold(self) -> None:
+        """Keep deferred actions for at least one more tick, when a cutscene is about to start."""
+        self._held = True
+
+    async def release(self, cutscene_playing: bool) -> None:
+        """
+        Run the deferred actions unless a cutscene is playing or actions are held.
+
+        :param cutscene_playing: A cutscene plays in this tick
+        """
+        if self._held or cutscene_playing:
+            self._held = False
+            return
+        actions, self._actions = self._actions, {}
+        for action in actions.values():
+            await action()
+
 
 class SFAContext(CommonContext):
     """
@@ -114,19 +368,11 @@ class SFAContext(CommonContext):
     game = "Star Fox Adventures"
     items_handling = 0b111  # full remote
 
-    #: Temp should save in memory
-    expected_idx = 0
-    received_items_id: ClassVar[list[int]] = []
-
     victory = False
 
     #: Player state (probably change to server)
     fuel_cell_count = 0
-    shop_visited = False
 
-    #: Suppose the player starts in main menu
-    stored_map = 0x3F
-    stored_dim = 0
     stored_dim2 = 0
 
     def __init__(self, server_address, password):
@@ -145,6 +391,64 @@ class SFAContext(CommonContext):
         self.awaiting_rom: bool = False
         self.tags = {"AP"}
         self.sync_task: asyncio.Task[None] | None = None
+        #: Check every location on the next tick instead of the changed ones only
+        self.full_location_scan = True
+        #: Reconcile every item with the received items on the next tick
+        self.full_item_sync = True
+        #: Constant flags were forced since the last save load
+        self.flags_forced = False
+        #: Forced flag bytes the game changed back
+        self.flag_drift = 0
+        #: Number of each item ID delivered to the game
+        self.received_items_id: Counter[int] = Counter()
+        #: Delivery cursor restored from the journal, the next delivery job counts the items delivered before it
+        self.recount_items = False
+        self.memory_worker = MemoryWorker()
+        #: Messages to the server, sent by their own task
+        self.outbox = Outbox(partial(_send_messages, self), on_sent=partial(_on_messages_sent, self))
+        self.cutscene_deferral = CutsceneDeferral()
+        #: Set when items are received, to deliver them without waiting for the next tick
+        self.delivery_event = asyncio.Event()
+        #: Arrival time of received items not delivered yet, by index
+        self.item_arrivals: dict[int, float] = {}
+        #: Item ID and seconds from packet arrival to committed memory write of the last delivered items
+        self.delivery_latencies: deque[tuple[int, float]] = deque(maxlen=DELIVERY_LATENCY_HISTORY)
+        #: Index of the next received item to deliver
+        self.expected_idx = 0
+        #: Index of the first received item whose consumable effect was not applied yet
+        self.consumable_idx = 0
+        #: Suppose the player starts in main menu
+        self.stored_map = MAIN_MENU_ID
+        self.stored_dim = 0
+        #: Locations already scouted
+        self.scouted_locations: set[int] = set()
+        #: Consecutive ticks that failed while Dolphin was still hooked
+        self.tick_errors = 0
+        #: Time the connection to Dolphin was lost, None while connected
+        self.detached_at: float | None = None
+        #: Seconds from losing the connection to Dolphin to attaching it again
+        self.reattach_times = RollingStats(REATTACH_HISTORY)
+        #: Timing of the tick stages, and backend calls per tick
+        self.perf = PerfStats()
+        #: Ticks longer than TICK_BUDGET
+        self.tick_overruns = 0
+        #: Detection time and send queue entry time of the location checks not sent yet, by location ID
+        self.check_traces: dict[int, list[float]] = {}
+        #: Seconds from detecting a location check to sending it, by location type
+        self.check_latency = PerfStats()
+        #: Journal of the connected slot state, to resume after a client restart
+        self.journal: SlotJournal | None = None
+        #: Index of the next item whose delivery latency is recorded
+        self.latency_idx = 0
+        #: Game watcher subsystems, in tick order, with their period and budget in seconds
+        self.scheduler = TickScheduler(
+            [
+                ScheduledTask("flags", partial(force_gameflags, self), 1.0, 0.05),
+                ScheduledTask("locations", partial(locations_watcher, self), 0.1, 0.05),
+                ScheduledTask("items", partial(give_items, self), 0.1, 0.05),
+                ScheduledTask("map", partial(special_map_flags, self), 0.05, 0.025),
+            ]
+        )
 
     async def server_auth(self, password_requested: bool = False):
         """
@@ -169,25 +473,62 @@ class SFAContext(CommonContext):
 
     def on_package(self, cmd: str, args: dict):
         """Handle incoming packages from the server."""
+        if cmd == "Connected":
+            self.full_location_scan = True
+            _open_journal(self)
+        elif cmd == "ReceivedItems":
+            arrival = time.monotonic()
+            for index in range(max(args["index"], self.expected_idx), args["index"] + len(args["items"])):
+                self.item_arrivals[index] = arrival
+            self.delivery_event.set()
         return super().on_package(cmd, args)
 
 
-def sync_player_state(ctx: SFAContext):
+async def memory_job(ctx: SFAContext, priority: int, function, *args):
     """
-    Synchronize the player's state with the current game data.
+    Run a function accessing game memory on the memory worker.
 
     :param ctx: The Star Fox Adventures context
+    :param priority: Job priority
+    :param function: Function to run
+    :param args: Arguments of the function
+    :return: Result of the function
+    """
+    return await ctx.memory_worker.submit(priority, function, *args)
+
+
+def sync_player_state(state: JobState):
+    """
+    Synchronize the player's state with the current game data.
+
+    :param state: Client state copy
+    """
+    _give_item_in_game(state, FILLER_ITEMS["Fuel Cell"])
+    _give_item_in_game(state, ITEM_INVENTORY["SHW Alpine Root"])
+    _give_item_in_game(state, ITEM_INVENTORY["Scarab Bag (Progressive)"])
+    _give_item_in_game(state, USEFUL_ITEMS["HP Upgrade"])
+    _give_item_in_game(state, USEFUL_ITEMS["MP Upgrade"])
+    _give_item_in_game(state, ITEM_INVENTORY["White GrubTub"])
+    _give_item_in_game(state, ITEM_INVENTORY["Gate Key"])
+    _give_item_in_game(state, ITEM_INVENTORY["Entrance Bridge Cog"])
+    _give_item_in_game(state, ITEM_INVENTORY["DIM Alpine Root"])
+    _give_item_in_game(state, ITEM_TRICKY["Tricky (Progressive)"])
+
+
+def _reconcile_items(state: JobState, received_items: Counter[int]) -> None:
+    """
+    Reconcile the player state in a single commit.
+
+    :param state: Client state copy
+    :param received_items: Number of copies received for each item ID
     """
-    _give_item_in_game(ctx, FILLER_ITEMS["Fuel Cell"])
-    _give_item_in_game(ctx, ITEM_INVENTORY["SHW Alpine Root"])
-    _give_item_in_game(ctx, ITEM_INVENTORY["Scarab Bag (Progressive)"])
-    _give_item_in_game(ctx, USEFUL_ITEMS["HP Upgrade"])
-    _give_item_in_game(ctx, USEFUL_ITEMS["MP Upgrade"])
-    _give_item_in_game(ctx, ITEM_INVENTORY["White GrubTub"])
-    _give_item_in_game(ctx, ITEM_INVENTORY["Gate Key"])
-    _give_item_in_game(ctx, ITEM_INVENTORY["Entrance Bridge Cog"])
-    _give_item_in_game(ctx, ITEM_INVENTORY["DIM Alpine Root"])
-    _give_item_in_game(ctx, ITEM_TRICKY["Tricky (Progressive)"])
+    held = SHADOW.buffering
+    if not held:
+        SHADOW.refresh()
+        SHADOW.begin()
+    reconcile_player_state(state, received_items)
+    if not held:
+        SHADOW.commit()
 
 
 async def sync_full_player_state(ctx: SFAContext):
@@ -197,99 +538,205 @@ async def sync_full_player_state(ctx: SFAContext):
     :param ctx: The Star Fox Adventures context
     """
     logger.debug("Syncing full player state")
-    received_items = ctx.items_received
-    for _, item in enumerate(received_items):
-        while not _give_item_in_game(ctx, SFAItemData.get_by_id(item.item)):
-            await asyncio.sleep(0.01)
-    sync_player_state(ctx)
-
-
-async def _wait_cutscene_end():
-    """Wait until a cutscene is over."""
-    seq = dme.read_byte(CURRENT_SEQ_ADDRESS)
-    while seq != 0:
-        seq = dme.read_byte(CURRENT_SEQ_ADDRESS)
-        await asyncio.sleep(0.1)
+    received_items = Counter(item.item for item in ctx.items_received)
+    await memory_job(ctx, PRIORITY_DELIVERY, _reconcile_items, _job_state(ctx), received_items)
+    if received_items[VICTORY_ITEM_ID]:
+        ctx.victory = True
 
 
-async def locations_watcher(ctx):
+async def sync_item_state(ctx: SFAContext, name: str, item: SFAItemData) -> None:
     """
-    Watch for location checks in the game and notify the server.
+    Synchronize a single item with the received items, consumables are given once more.
 
     :param ctx: The Star Fox Adventures context
+    :param name: Item name, for logging
+    :param item: The item data to synchronize
     """
+    try:
+        given = await memory_job(ctx, PRIORITY_DELIVERY, _give_item_in_game, _job_state(ctx), item)
+    except Exception:
+        logger.error(f"Failed to synchronize {name}.")
+        logger.debug(traceback.format_exc())
+        return
+    if not given:
+        logger.error(f"Failed to synchronize {name}.")
 
-    def _check_location_flag(ctx: SFAContext, location: SFALocationData) -> bool:
-        """
-        Check if a location has been checked based on its flag.
 
-        :param ctx: The Star Fox Adventures context
-        :param location: The location data to check
-        """
-        if location.id not in ctx.server_locations or location.id in ctx.locations_checked:
-            return False
-        address, bit_position = get_bit_address(location.table_address, location.bit_offset)
-        byte = dme.read_byte(address)
-        if bit_position in extract_bitflag_list(byte):
-            ctx.locations_checked.add(location.id)
-            return True
-        return False
+def _check_locations(state: JobState, full_scan: bool) -> tuple[bool, list[int]]:
+    """
+    Check locations in the game memory.
 
-    def _check_location_value(ctx: SFAContext, location: SFACountLocationData) -> bool:
+    :param state: Client state copy
+    :param full_scan: Check every location instead of the ones reading a changed byte
+    :return: True if a check may have started a cutscene, IDs of the locations newly checked
+    """
+
+    def _check_location_flag(state: JobState, location: SFALocationData) -> bool:
         """
-        Check if a location has been checked based on its value.
+        Check if a location has been checked based on its flag.
 
-        :param ctx: The Star Fox Adventures context
+        :param state: Client state copy
         :param location: The location data to check
         """
-        if location.id not in ctx.server_locations or location.id in ctx.locations_checked:
+        if location.id not in state.server_locations or location.id in state.locations_checked:
             return False
-        value = read_value_bytes(location.table_address, location.bit_offset, location.bit_size)
-        if value >= location.count:
-            ctx.locations_checked.add(location.id)
-            return True
-        return False
-
-    for location_data in NORMAL_TABLES.values():
-        if isinstance(location_data, SFALinkedLocationData):
-            map_value = read_value_bytes(
-                location_data.map_address, 0, location_data.map_bit_size * 8, location_data.map_bit_size
-            )
-            if map_value == location_data.map_value:
-                _check_location_flag(ctx, location_data)
-        elif isinstance(location_data, SFACountLocationData):
-            if _check_location_value(ctx, location_data):
-                await _wait_cutscene_end()
-        else:
-            _check_location_flag(ctx, location_data)
-
-    map_value = dme.read_byte(MAP_ID_ADDRESS)
-    if map_value == MAGIC_CAVE_ID and ctx.stored_map == MAGIC_CAVE_ID:
+        return read_flag_bit(location.table_address, location.bit_offset)
+
+    # Only check locations reading a byte that changed since the last tick
+    changed_addresses = SHADOW.changed_addresses()
+    rows = None
+    if changed_addresses is not None and not full_scan:
+        rows = LOCATION_CHECKS.candidate_rows(changed_addresses)
+
+    new_locations = LOCATION_CHECKS.evaluate(SHADOW.snapshot(), state.server_locations, state.locations_checked, rows)
+    found = [location.id for location in new_locations]
+    cutscene = any(isinstance(location, SFACountLocationData) for location in new_locations)
+
+    map_value = SHADOW.read_byte(MAP_ID_ADDRESS)
+    if map_value == MAGIC_CAVE_ID and state.stored_map == MAGIC_CAVE_ID:
+        mc_act = read_value_bytes(MAGIC_CAVE_ACT_ADDRESS, 2, 4)
+        mc_flags = extract_bitflag_list(read_value_bytes(MAGIC_CAVE_FLAG_ADDRESS, 0, 32, 4))
         for loc_data in LOCATION_UPGRADE.values():
-            mc_act_byte = dme.read_byte(MAGIC_CAVE_ACT_ADDRESS)
-            mc_act = extract_bits_value(mc_act_byte, offset=2, size=4)
-            mc_flags_raw = dme.read_word(MAGIC_CAVE_FLAG_ADDRESS)
-            mc_flags = extract_bitflag_list(swap_endian(mc_flags_raw))
             if (mc_act == MAGIC_CAVE_UPGRADE_ACT and loc_data.mc_bitflag in mc_flags) or (
                 mc_act == MAGIC_CAVE_MANA_ACT and loc_data.mc_bitflag is None
             ):
-                _check_location_flag(ctx, loc_data)
-                # Wait for anim end
-                await _wait_cutscene_end()
+                if _check_location_flag(state, loc_data):
+                    found.append(loc_data.id)
+                    # Wait for anim end
+                    cutscene = True
 
-    if map_value == SHOP_ID and ctx.stored_map == SHOP_ID:
+    if map_value == SHOP_ID and state.stored_map == SHOP_ID:
         for loc_data in LOCATION_SHOP.values():
-            _check_location_flag(ctx, loc_data)
+            if _check_location_flag(state, loc_data):
+                found.append(loc_data.id)
 
-    locations_checked = ctx.locations_checked.difference(ctx.checked_locations)
-    if locations_checked:
-        await _wait_cutscene_end()
-        sync_player_state(ctx)
-        await ctx.send_msgs([{"cmd": "LocationChecks", "locations": locations_checked}])
+    return cutscene, found
+
+
+async def locations_watcher(ctx: SFAContext):
+    """
+    Watch for location checks in the game and notify the server.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    detected = time.monotonic()
+    full_scan = ctx.full_location_scan
+    ctx.full_location_scan = False
+    cutscene_expected, found = await memory_job(ctx, PRIORITY_LOCATIONS, _check_locations, _job_state(ctx), full_scan)
+    ctx.locations_checked.update(found)
+    if cutscene_expected:
+        # The cutscene starts in a later tick
+        ctx.cutscene_deferral.hold()
+    for location_id in found:
+        ctx.check_traces[location_id] = [detected]
+
+    if ctx.locations_checked.difference(ctx.checked_locations):
+        ctx.cutscene_deferral.defer("location_checks", partial(_send_location_checks, ctx))
 
     if ctx.victory and not ctx.finished_game:
-        await ctx.send_msgs([{"cmd": "StatusUpdate", "status": ClientStatus.CLIENT_GOAL}])
-        ctx.finished_game = True
+        # finished_game is set once the status is sent
+        ctx.outbox.update_status(ClientStatus.CLIENT_GOAL)
+
+
+async def _send_location_checks(ctx: SFAContext):
+    """
+    Synchronize the player state and send the location checks not confirmed by the server.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    locations_checked = ctx.locations_checked.difference(ctx.checked_locations)
+    if locations_checked and not ctx.recount_items:
+        await memory_job(ctx, PRIORITY_DELIVERY, sync_player_state, _job_state(ctx))
+        queued = time.monotonic()
+        for location_id in locations_checked:
+            trace = ctx.check_traces.get(location_id)
+            if trace is not None and len(trace) == 1:
+                trace.append(queued)
+        ctx.outbox.check_locations(locations_checked)
+
+
+async def _send_messages(ctx: SFAContext, messages: list[dict]) -> bool:
+    """
+    Send messages to the server, if connected.
+
+    :param ctx: The Star Fox Adventures context
+    :param messages: Messages to send
+    :return: True if the messages were written to the server socket, False if not connected
+    """
+    # send_msgs silently drops the messages when the socket is not open
+    if not ctx.server or not ctx.server.socket.open or ctx.server.socket.closed:
+        return False
+    await ctx.send_msgs(messages)
+    return True
+
+
+def _on_messages_sent(ctx: SFAContext, messages: list[dict]) -> None:
+    """
+    Record the latency of the location checks just sent to the server, and the goal once it is reported.
+
+    :param ctx: The Star Fox Adventures context
+    :param messages: Messages sent
+    """
+    sent = time.monotonic()
+    for message in messages:
+        if message["cmd"] == "StatusUpdate" and message["status"] == ClientStatus.CLIENT_GOAL:
+            ctx.finished_game = True
+        if message["cmd"] != "LocationChecks":
+            continue
+        for location_id in message["locations"]:
+            trace = ctx.check_traces.pop(location_id, None)
+            if trace is None or len(trace) < 2:
+                continue
+            detected, queued = trace
+            ctx.check_latency.add(LOCATIONS_BY_ID[location_id].type.name, sent - detected)
+            ctx.perf.add("check_queue", queued - detected)
+            ctx.perf.add("check_send", sent - queued)
+
+
+def _give_new_items(
+    state: JobState, pending: list, expected_idx: int, consumable_idx: int, delivered: list | None = None
+) -> tuple[int, Counter[int]]:
+    """
+    Give the player all items at an index greater than or equal to the expected index.
+
+    Items are grouped by ID, so each affected field is written once whatever the number of items.
+
+    :param state: Client state copy
+    :param pending: Items received from the server, from the expected index
+    :param expected_idx: Index of the next received item to deliver
+    :param consumable_idx: Index of the first received item whose consumable effect was not applied yet
+    :param delivered: Items before the expected index to count again instead of the state counts, None to keep them
+    :return: Index of the next item to deliver after this delivery, number of each item ID delivered so far
+    """
+    received_items_id = state.received_items_id
+    if delivered is not None:
+        received_items_id = Counter(item.item for item in delivered)
+    for offset, item in enumerate(pending):
+        if item.item not in ITEMS_BY_ID:
+            # Give the items before, try again on the next tick
+            logger.error(f"Item not found in data: {item.item}")
+            pending = pending[:offset]
+            break
+    if not pending:
+        return expected_idx, received_items_id
+
+    end_idx = expected_idx + len(pending)
+    counts = Counter(item.item for item in pending)
+    logger.debug(f"Received {len(pending)} items, {len(counts)} distinct")
+    received_items_id = received_items_id + counts
+    for item_id in counts:
+        item = ITEMS_BY_ID[item_id]
+        if not isinstance(item, SFAConsumableItemData):
+            _set_item_state(state, item, received_items_id[item_id])
+    # Consumables are applied exactly once, after upgrades so refills are capped by the final maximum values
+    fresh = Counter(item.item for item in pending[max(consumable_idx - expected_idx, 0) :])
+    consumables = []
+    for item_id, count in fresh.items():
+        item = ITEMS_BY_ID[item_id]
+        if isinstance(item, SFAConsumableItemData):
+            consumables.append((item, count))
+    _give_consumables(consumables)
+    return end_idx, received_items_id
 
 
 async def give_items(ctx: SFAContext):
@@ -299,29 +746,36 @@ async def give_items(ctx: SFAContext):
     :param ctx: The Star Fox Adventures context
     """
     expected_idx = ctx.expected_idx
-
-    # Check if there are new items.
-    received_items = ctx.items_received
-    if len(received_items) <= expected_idx:
-        # There are no new items.
+    if len(ctx.items_received) < expected_idx or (len(ctx.items_received) == expected_idx and not ctx.recount_items):
+        # There are no new items, or the items delivered before the restart were not received again yet
         return
-
-    # Loop through items to give.
-    # Give the player all items at an index greater than or equal to the expected index.
-    for idx, item in enumerate(received_items[expected_idx:], expected_idx):
-        # Attempt to give the item and increment the expected index.
-        logger.debug(f"Received item: {item}")
-        ctx.received_items_id.append(item.item)
-        while not _give_item_in_game(ctx, SFAItemData.get_by_id(item.item)):
-            await asyncio.sleep(0.01)
-        ctx.expected_idx = idx + 1
+    journal = ctx.journal
+    end_idx, received_items_id = await memory_job(
+        ctx,
+        PRIORITY_DELIVERY,
+        _give_new_items,
+        _job_state(ctx),
+        ctx.items_received[expected_idx:],
+        expected_idx,
+        ctx.consumable_idx,
+        ctx.items_received[:expected_idx] if ctx.recount_items else None,
+    )
+    if ctx.journal is not journal or ctx.expected_idx != expected_idx:
+        # The slot state was restored from the journal meanwhile, delivery starts over from the restored index
+        return
+    ctx.received_items_id = received_items_id
+    ctx.recount_items = False
+    ctx.consumable_idx = max(ctx.consumable_idx, end_idx)
+    ctx.expected_idx = end_idx
+    if received_items_id[VICTORY_ITEM_ID]:
+        ctx.victory = True
 
 
-def _give_item_in_game(ctx: SFAContext, item: SFAItemData | None) -> bool:
+def _give_item_in_game(state: JobState, item: SFAItemData | None) -> bool:
     """
     Give an item to the player in the game.
 
-    :param ctx: The Star Fox Adventures context
+    :param state: Client state copy
     :param item: The item data to give
     :return: True if the item was given successfully, False otherwise
     """
@@ -329,26 +783,60 @@ def _give_item_in_game(ctx: SFAContext, item: SFAItemData | None) -> bool:
         logger.error("Item not found in data.")
         return False
 
-    if item.id == 2000:  # Victory
-        ctx.victory = True
+    if isinstance(item, SFAConsumableItemData):
+        _give_consumables([(item, 1)])
         return True
 
-    if ctx.stored_map == SHOP_ID and (
-        item.type == SFAItemType.SHOP_PROGRESSION or item.type == SFAItemType.SHOP_USEFUL
+    _set_item_state(state, item, state.received_items_id[item.id])
+    return True
+
+
+def _give_consumables(consumables: Iterable[tuple[SFAConsumableItemData, int]]) -> None:
+    """
+    Add consumable items to their current value, up to the maximum value.
+
+    Items filling the same field are summed and written once.
+
+    :param consumables: Consumable item data and number of items to add
+    """
+    totals: dict[tuple[int, int, int, int, int], int] = {}
+    for item, count in consumables:
+        field = (item.table_address, item.bit_offset, item.bit_size, item.max_read_address, item.max_read_bit_size)
+        totals[field] = totals.get(field, 0) + item.add_value * count
+    for (table_address, bit_offset, bit_size, max_read_address, max_read_bit_size), added in totals.items():
+        current_value = read_value_bytes(table_address, bit_offset, bit_size)
+        value = current_value + added
+        max_value = read_value_bytes(max_read_address, 0x0, max_read_bit_size)
+        if value > max_value:
+            value = max_value
+        set_value_bytes(table_address, bit_offset, value, bit_size)
+
+
+def _set_item_state(state: JobState, item: SFAItemData, count: int) -> None:
+    """
+    Set the flags and values of an item in the game for the number of copies received.
+
+    :param state: Client state copy
+    :param item: The item data, not a consumable
+    :param count: Number of copies received
+    """
+    if item.id == VICTORY_ITEM_ID:
+        return
+
+    if state.stored_map == SHOP_ID and any(
+        isinstance(location, SFAShopLocationData) for location in LINKED_LOCATIONS_BY_ITEM.get(item.id, ())
     ):
-        # Don't send shop items if inside shop
-        return True
+        # Don't send shop items if inside shop, they share their flag with the shop location
+        return
 
     if isinstance(item, SFAProgressiveItemData):
-        count = ctx.received_items_id.count(item.id)
         for id, progress in enumerate(item.progressive_data):
             # Set True until count and False for the rest
             set_flag_bit(progress[1], progress[0], count > id)
         logger.debug(f"Received {count} of progressive object: {item}")
-        return True
+        return
 
     if isinstance(item, SFAQuestItemData):
-        count = ctx.received_items_id.count(item.id)
         if count > item.max_count:
             count = item.max_count
             # Could read location count instead
@@ -358,210 +846,430 @@ def _give_item_in_game(ctx: SFAContext, item: SFAItemData | None) -> bool:
             value = 0
         logger.debug(f"Received {count} of quest object: {item}")
         set_value_bytes(item.table_address, item.bit_offset, value, item.bit_size)
-        return True
+        return
 
     if isinstance(item, SFACountItemData):
-        count = ctx.received_items_id.count(item.id)
         if count > item.max_count:
             count = item.max_count
         value = item.start_amount + count * item.count_increment
         logger.debug(f"Received {count} of count object: {item}")
         set_value_bytes(item.table_address, item.bit_offset, value, item.bit_size)
-        return True
-
-    if isinstance(item, SFAConsumableItemData):
-        current_value = read_value_bytes(item.table_address, item.bit_offset, item.bit_size)
-        value = current_value + item.add_value
-        max_value = read_value_bytes(item.max_read_address, 0x0, item.max_read_bit_size)
-        if value > max_value:
-            value = max_value
-        set_value_bytes(item.table_address, item.bit_offset, value, item.bit_size)
-        return True
+        return
 
     if isinstance(item, SFAPlanetItemData):
-        set_flag_bit(item.table_address, item.bit_offset, item.id in ctx.received_items_id)
-        set_flag_bit(item.gate_table_address, item.gate_bit_offset, item.id in ctx.received_items_id)
-        return True
+        set_flag_bit(item.table_address, item.bit_offset, count > 0)
+        set_flag_bit(item.gate_table_address, item.gate_bit_offset, count > 0)
+        return
 
     # All other items
-    set_flag_bit(item.table_address, item.bit_offset, item.id in ctx.received_items_id)
-    return True
+    set_flag_bit(item.table_address, item.bit_offset, count > 0)
 
 
-async def force_gameflags(ctx: SFAContext) -> None:
+def reconcile_player_state(state: JobState, received_items: Counter[int]) -> None:
     """
-    Force game flags when starting a save.
+    Set every item controlled flag and value to its target state from the received items.
 
-    :param ctx: The Star Fox Adventures context
+    Count, quest and progressive items are always set, flag items only once received and consumables are left alone.
+    Writes are diffed against the memory snapshot, so only differing bytes reach the game.
+
+    :param state: Client state copy
+    :param received_items: Number of copies received for each item ID
     """
-    # Set bitflags when starting save
-    map_value = dme.read_byte(MAP_ID_ADDRESS)
-    if ctx.stored_map != map_value and ctx.stored_map == MAIN_MENU_ID:
-        logger.debug("Set starting flags")
-        set_on_or_bytes(ITEM_MAP_ADDRESS, ITEM_MAP_INIT_VALUE, 3)
-        set_on_or_bytes(SKIP_TUTO_ADDRESS, SKIP_TUTO_VALUE, 2)
-        for item in STARTING_FLAGS:
-            set_flag_bit(item.table_address, item.bit_offset, item.state)
-        await sync_full_player_state(ctx)
+    for item in ALL_ITEMS_TABLE.values():
+        if isinstance(item, SFAConsumableItemData):
+            continue
+        count = received_items[item.id]
+        if count or isinstance(item, (SFAProgressiveItemData, SFACountItemData, SFAQuestItemData)):
+            _set_item_state(state, item, count)
 
-    for item in CONSTANT_FLAGS:
-        set_flag_bit(item.table_address, item.bit_offset, item.state)
 
-    map_value = dme.read_byte(MAP_ID_ADDRESS)
+def _force_gameflags(state: JobState) -> int:
+    """
+    Force game flags in memory.
+
+    :param state: Client state copy
+    :return: Number of constant flag bytes that were not in their forced state
+    """
+    drift = apply_flag_patch(CONSTANT_PATCH)
+
+    map_value = SHADOW.read_byte(MAP_ID_ADDRESS)
     if map_value == 0x38:
         tricky_item = ITEM_TRICKY["Tricky (Progressive)"]
         tricky_flag = tricky_item.progressive_data[0]
-        set_flag_bit(tricky_flag[1], tricky_flag[0], tricky_item.id in ctx.received_items_id)
+        set_flag_bit(tricky_flag[1], tricky_flag[0], tricky_item.id in state.received_items_id)
 
-    address, position = get_bit_address(DINO_CAVE.table_address, DINO_CAVE.bit_offset)
-    byte = dme.read_byte(address)
-    if position in extract_bitflag_list(byte):
+    if read_flag_bit(DINO_CAVE.table_address, DINO_CAVE.bit_offset):
         dino_horn = ITEM_INVENTORY["Dinosaur Horn"]
-        set_flag_bit(dino_horn.table_address, dino_horn.bit_offset, dino_horn.id in ctx.received_items_id)
+        set_flag_bit(dino_horn.table_address, dino_horn.bit_offset, dino_horn.id in state.received_items_id)
 
     # Force Bomb_spore to 1 for testing
     # address, position = get_bit_address(T2_ADDRESS, 0x77)
     # cache_byte = dme.read_byte(address)
     # updated_byte = update_bits(cache_byte, position, True)
     # dme.write_byte(address, updated_byte)
+    return drift
 
 
-async def special_map_flags(ctx: SFAContext) -> None:
+async def force_gameflags(ctx: SFAContext) -> None:
     """
-    Handle special map flags for certain locations.
+    Force constant game flags.
 
     :param ctx: The Star Fox Adventures context
     """
+    if ctx.recount_items:
+        # Item dependent flags would be cleared until the next delivery counts the received items again
+        return
+    drift = await memory_job(ctx, PRIORITY_FLAGS, _force_gameflags, _job_state(ctx))
+    if ctx.flags_forced and drift:
+        logger.debug(f"Game reverted {drift} forced flag bytes")
+        ctx.flag_drift += drift
+    ctx.flags_forced = True
 
-    def _special_location_item_toggle(
-        ctx: SFAContext,
-        location: SFAUpgradeLocationData | SFAShopLocationData,
-        map_entered: int,
-        map_expected: int,
-    ):
-        """
-        Toggle special location items based on the map entered.
 
-        :param ctx: The Star Fox Adventures context
-        :param location: The location data to toggle
-        :param map_entered: The map that was entered
-        :param map_expected: The expected map for the location
-        """
-        if map_entered == map_expected:
-            if location.id in ctx.checked_locations or location.id not in ctx.server_locations:
-                # Checked location (or does not exist), force item ON
-                set_flag_bit(location.table_address, location.bit_offset, True)
-            else:
-                # Unchecked location, force item OFF
-                set_flag_bit(location.table_address, location.bit_offset, False)
-        if ctx.stored_map == map_expected:
-            if location.type == SFALocationType.MAP or location.linked_item in ctx.received_items_id:
-                # Item received, set flag back ON
-                set_flag_bit(location.table_address, location.bit_offset, True)
-            else:
-                # Item not received, set flag back OFF
-                set_flag_bit(location.table_address, location.bit_offset, False)
+MAP_TRANSITIONS = TransitionBus()
+DIM_TRANSITIONS = TransitionBus()
 
-    map_value = dme.read_byte(MAP_ID_ADDRESS)
-    if ctx.stored_map != map_value:
-        logger.debug(f"Entering map {map_value:x}")
-        await ctx.send_msgs(
-            [
-                {
-                    "cmd": "Set",
-                    "key": f"SFA_current_map_{ctx.team}_{ctx.slot}",
-                    "default": {},
-                    "operations": [
-                        {
-                            "operation": "replace",
-                            "value": map_value,
-                        }
-                    ],
-                }
-            ]
-        )
 
-        #: Check Magic Cave locations
-        mc_act_byte = dme.read_byte(MAGIC_CAVE_ACT_ADDRESS)
-        mc_act = extract_bits_value(mc_act_byte, offset=2, size=4)
-        mc_flags_bytes = dme.read_word(MAGIC_CAVE_FLAG_ADDRESS)
-        mc_flags = extract_bitflag_list(swap_endian(mc_flags_bytes))
-        for loc_data in LOCATION_UPGRADE.values():
-            if mc_act == MAGIC_CAVE_UPGRADE_ACT and loc_data.mc_bitflag in mc_flags:
-                _special_location_item_toggle(ctx, loc_data, map_value, MAGIC_CAVE_ID)
-
-        #: Check Shop locations
-        if map_value == SHOP_ID and not ctx.shop_visited:
-            await ctx.send_msgs(
-                [
-                    {
-                        "cmd": "LocationScouts",
-                        "locations": [loc.id for loc in LOCATION_SHOP.values() if loc.id in ctx.server_locations],
-                        "create_as_hint": 2,
-                    }
-                ]
-            )
-            ctx.shop_visited = True
-        for loc_data in LOCATION_SHOP.values():
-            _special_location_item_toggle(ctx, loc_data, map_value, SHOP_ID)
+@MAP_TRANSITIONS.on_leave(MAIN_MENU_ID)
+def _start_save(state: JobState, previous_map: int, map_value: int) -> None:
+    """Set bitflags when starting save."""
+    logger.debug("Set starting flags")
+    apply_flag_patch(STARTING_PATCH)
+
+
+def _force_location_state(state: JobState, location: SFAUpgradeLocationData | SFAShopLocationData) -> None:
+    """
+    Set a location flag to the check state of the location, when entering its map.
+
+    :param state: Client state copy
+    :param location: The location data to toggle
+    """
+    # Checked location (or does not exist) ON, unchecked location OFF
+    checked = location.id in state.checked_locations or location.id not in state.server_locations
+    set_flag_bit(location.table_address, location.bit_offset, checked)
+
+
+def _restore_item_state(state: JobState, location: SFAUpgradeLocationData | SFAShopLocationData) -> None:
+    """
+    Set a location flag back to the state of its linked item, when leaving its map.
+
+    :param state: Client state copy
+    :param location: The location data to toggle
+    """
+    received = location.type == SFALocationType.MAP or location.linked_item in state.received_items_id
+    set_flag_bit(location.table_address, location.bit_offset, received)
+
 
-        # Force SH act2
-        if map_value == THORNTAIL_HOLLOW_ID:
-            set_value_bytes(T2_ADDRESS, THORNTAIL_HOLLOW_ACT_OFFSET, 0x2, value_size=4)
+def _active_upgrades() -> list[SFAUpgradeLocationData]:
+    """
+    List the Magic Cave upgrades currently offered.
+
+    :return: Upgrade locations
+    """
+    mc_act = read_value_bytes(MAGIC_CAVE_ACT_ADDRESS, 2, 4)
+    if mc_act != MAGIC_CAVE_UPGRADE_ACT:
+        return []
+    mc_flags = extract_bitflag_list(read_value_bytes(MAGIC_CAVE_FLAG_ADDRESS, 0, 32, 4))
+    return [loc_data for loc_data in LOCATION_UPGRADE.values() if loc_data.mc_bitflag in mc_flags]
+
+
+@MAP_TRANSITIONS.on_enter(MAGIC_CAVE_ID)
+def _enter_magic_cave(state: JobState, previous_map: int, map_value: int) -> None:
+    """Check Magic Cave locations."""
+    for loc_data in _active_upgrades():
+        _force_location_state(state, loc_data)
+
+
+@MAP_TRANSITIONS.on_leave(MAGIC_CAVE_ID)
+def _leave_magic_cave(state: JobState, previous_map: int, map_value: int) -> None:
+    """Restore upgrade items after the Magic Cave."""
+    for loc_data in _active_upgrades():
+        _restore_item_state(state, loc_data)
+
+
+@MAP_TRANSITIONS.on_enter(SHOP_ID)
+def _enter_shop(state: JobState, previous_map: int, map_value: int) -> None:
+    """Check Shop locations."""
+    for loc_data in LOCATION_SHOP.values():
+        _force_location_state(state, loc_data)
+
+
+@MAP_TRANSITIONS.on_leave(SHOP_ID)
+def _leave_shop(state: JobState, previous_map: int, map_value: int) -> None:
+    """Restore shop items after the Shop."""
+    for loc_data in LOCATION_SHOP.values():
+        _restore_item_state(state, loc_data)
+
+
+@MAP_TRANSITIONS.on_enter(THORNTAIL_HOLLOW_ID)
+def _enter_thorntail_hollow(state: JobState, previous_map: int, map_value: int) -> None:
+    """Force SH act2."""
+    set_value_bytes(T2_ADDRESS, THORNTAIL_HOLLOW_ACT_OFFSET, 0x2, value_size=4)
+
+
+@MAP_TRANSITIONS.on_enter(WORLD_MAP_ID)
+def _enter_world_map(state: JobState, previous_map: int, map_value: int) -> None:
+    """Remove fireblaster in world map."""
+    item = ITEM_STAFF["Fire Blaster"]
+    set_flag_bit(item.table_address, item.bit_offset, False)
+
+
+@MAP_TRANSITIONS.on_leave(WORLD_MAP_ID)
+def _leave_world_map(state: JobState, previous_map: int, map_value: int) -> None:
+    """Give back fireblaster after the world map."""
+    item = ITEM_STAFF["Fire Blaster"]
+    set_flag_bit(item.table_address, item.bit_offset, item.id in state.received_items_id)
+
+
+@MAP_TRANSITIONS.on_enter(KRAZOA_PALACE_ID)
+def _enter_krazoa_palace(state: JobState, previous_map: int, map_value: int) -> None:
+    """Give Krystal Spirit 1."""
+    flag = KRAZOA_SPIRIT_1
+    set_flag_bit(flag.table_address, flag.bit_offset, True)
 
-        # Remove fireblaster in world map
-        if map_value == WORLD_MAP_ID:
-            item = ITEM_STAFF["Fire Blaster"]
-            set_flag_bit(item.table_address, item.bit_offset, False)
-        if ctx.stored_map == WORLD_MAP_ID:
-            item = ITEM_STAFF["Fire Blaster"]
-            set_flag_bit(item.table_address, item.bit_offset, item.id in ctx.received_items_id)
 
-        # Give Krystal Spirit 1
-        if map_value == KRAZOA_PALACE_ID:
-            flag = KRAZOA_SPIRIT_1
-            set_flag_bit(flag.table_address, flag.bit_offset, True)
+@DIM_TRANSITIONS.on_enter(DIM_COGS_ZONE_VALUE, DIM_COGS_ZONE_VALUE2)
+def _enter_dim_cogs_zone(state: JobState, previous_dim: int, dim_obj_value: int) -> None:
+    """Place bridge cogs when entering the room."""
+    item = ITEM_INVENTORY.get("SharpClaw Fort Bridge Cogs")
+    assert isinstance(item, SFAProgressiveItemData)
+    count = state.received_items_id[item.id]
+    for id, progress in enumerate(item.progressive_data):
+        # Set True until count and False for the rest
+        set_flag_bit(progress[1], progress[0], count > id)
+        set_flag_bit(progress[1], progress[0] - 1, False)
 
-        ctx.stored_map = map_value
 
-    # Place bridge cogs when entering the room
+@DIM_TRANSITIONS.on_enter_other
+def _enter_dim_zone(state: JobState, previous_dim: int, dim_obj_value: int) -> None:
+    """Handle DIM zone transitions, identified by the difference between zone values."""
+    if (
+        dim_obj_value - previous_dim == DIM_BLIZZARD_ZONE_TRANSITION
+        or previous_dim - dim_obj_value == DIM_BLIZZARD_ZONE_TRANSITION
+    ):
+        logger.debug("Entering Blizzard zone")
+        for flag in DIM_OPEN_BLIZZARD:
+            set_flag_bit(flag.table_address, flag.bit_offset, False)
+    elif previous_dim - dim_obj_value == DIM_BIKE_ZONE_TRANSITION:
+        logger.debug("Bike zone transition")
+        for flag in DIM_OPEN_BIKE:
+            set_flag_bit(flag.table_address, flag.bit_offset, False)
+    else:
+        item = ITEM_INVENTORY.get("SharpClaw Fort Bridge Cogs")
+        location = [
+            LOCATION_ANY["DIM: Enemy Gate Cog Chest"],
+            LOCATION_ANY["DIM: Hut Cog Chest"],
+            LOCATION_ANY["DIM: Ice Cog Chest"],
+        ]
+        assert isinstance(item, SFAProgressiveItemData)
+        for _id, progress in enumerate(item.progressive_data):
+            # True to hide all cogs
+            set_flag_bit(progress[1], progress[0], True)
+        for loc in location:
+            set_flag_bit(loc.table_address, loc.bit_offset, loc.id in state.checked_locations)
+
+
+def _special_map_flags(state: JobState) -> tuple[int, int]:
+    """
+    Emit map and DIM zone transitions to update special map flags in memory.
+
+    :param state: Client state copy
+    :return: Current map ID and DIM zone value
+    """
+    map_value = SHADOW.read_byte(MAP_ID_ADDRESS)
+    if state.stored_map != map_value:
+        logger.debug(f"Entering map {map_value:x}")
+        MAP_TRANSITIONS.emit(state, state.stored_map, map_value)
+
     dim_obj_value = read_value_bytes(DIM_OBJECTS_ADDRESS, 0, 32, 4)
-    if dim_obj_value != ctx.stored_dim:
+    if dim_obj_value != state.stored_dim:
         logger.debug(f"Entering dim zone {dim_obj_value:x}")
-        if dim_obj_value == DIM_COGS_ZONE_VALUE or dim_obj_value == DIM_COGS_ZONE_VALUE2:
-            item = ITEM_INVENTORY.get("SharpClaw Fort Bridge Cogs")
-            assert isinstance(item, SFAProgressiveItemData)
-            count = ctx.received_items_id.count(item.id)
-            for id, progress in enumerate(item.progressive_data):
-                # Set True until count and False for the rest
-                set_flag_bit(progress[1], progress[0], count > id)
-                set_flag_bit(progress[1], progress[0] - 1, False)
-        elif (
-            dim_obj_value - ctx.stored_dim == DIM_BLIZZARD_ZONE_TRANSITION
-            or ctx.stored_dim - dim_obj_value == DIM_BLIZZARD_ZONE_TRANSITION
-        ):
-            logger.debug("Entering Blizzard zone")
-            for flag in DIM_OPEN_BLIZZARD:
-                set_flag_bit(flag.table_address, flag.bit_offset, False)
-        elif ctx.stored_dim - dim_obj_value == DIM_BIKE_ZONE_TRANSITION:
-            logger.debug("Bike zone transition")
-            for flag in DIM_OPEN_BIKE:
-                set_flag_bit(flag.table_address, flag.bit_offset, False)
-        else:
-            item = ITEM_INVENTORY.get("SharpClaw Fort Bridge Cogs")
-            location = [
-                LOCATION_ANY["DIM: Enemy Gate Cog Chest"],
-                LOCATION_ANY["DIM: Hut Cog Chest"],
-                LOCATION_ANY["DIM: Ice Cog Chest"],
-            ]
-            assert isinstance(item, SFAProgressiveItemData)
-            for _id, progress in enumerate(item.progressive_data):
-                # True to hide all cogs
-                set_flag_bit(progress[1], progress[0], True)
-            for loc in location:
-                set_flag_bit(loc.table_address, loc.bit_offset, loc.id in ctx.checked_locations)
+        DIM_TRANSITIONS.emit(state, state.stored_dim, dim_obj_value)
+
+    return map_value, dim_obj_value
+
+
+async def special_map_flags(ctx: SFAContext) -> None:
+    """
+    Handle special map flags for certain locations.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    if ctx.recount_items:
+        # Transitions restore item flags, wait for the next delivery to count the received items again
+        return
+    previous_map = ctx.stored_map
+    ctx.stored_map, ctx.stored_dim = await memory_job(ctx, PRIORITY_FLAGS, _special_map_flags, _job_state(ctx))
+    map_value = ctx.stored_map
+    if previous_map == MAIN_MENU_ID and map_value != MAIN_MENU_ID:
+        # Loading the save resets the constant flags
+        ctx.flags_forced = False
+        ctx.full_item_sync = True
+    if ctx.full_item_sync:
+        ctx.full_item_sync = False
+        await sync_full_player_state(ctx)
+    if map_value == previous_map:
+        return
+
+    ctx.outbox.set_value(f"SFA_current_map_{ctx.team}_{ctx.slot}", map_value, {})
+
+    #: Scout Shop locations
+    if map_value == SHOP_ID:
+        scouts = [
+            loc.id
+            for loc in LOCATION_SHOP.values()
+            if loc.id in ctx.server_locations and loc.id not in ctx.scouted_locations
+        ]
+        if scouts:
+            ctx.outbox.scout_locations(scouts, create_as_hint=2)
+            ctx.scouted_locations.update(scouts)
+
+
+def _begin_tick() -> tuple[bool, bool]:
+    """
+    Read the watched memory and hold writes until the end of the tick.
+
+    :return: True if a cutscene is playing, True if the watched memory changed since the previous tick
+    """
+    changed = SHADOW.refresh()
+    SHADOW.begin()
+    return SHADOW.read_byte(CURRENT_SEQ_ADDRESS) != 0, changed
+
+
+def _un_hook() -> None:
+    """Drop the memory snapshot and disconnect from Dolphin."""
+    SHADOW.invalidate()
+    SHADOW.backend.un_hook()
+
+
+def _hook_dolphin() -> bool | None:
+    """
+    Connect to Dolphin and check the running game.
+
+    :return: None if Dolphin is not found, False if the game is not Star Fox Adventures, True if connected
+    """
+    SHADOW.backend.hook()
+    if not SHADOW.backend.is_hooked():
+        return None
+    if SHADOW.backend.read_bytes(MEM1_ADDRESS, len(GAME_ID)) != GAME_ID:
+        SHADOW.backend.un_hook()
+        return False
+    return True
+
+
+def _record_delivery_latency(ctx: SFAContext) -> None:
+    """
+    Record the delivery latency of items delivered since the last commit.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    committed = time.monotonic()
+    for index in range(ctx.latency_idx, ctx.expected_idx):
+        arrival = ctx.item_arrivals.pop(index, None)
+        if arrival is not None:
+            latency = committed - arrival
+            ctx.delivery_latencies.append((ctx.items_received[index].item, latency))
+            logger.debug(f"Delivered item {index} in {latency * 1000:.1f} ms")
+    ctx.latency_idx = ctx.expected_idx
+
+
+def _open_journal(ctx: SFAContext) -> None:
+    """
+    Open the journal of the connected slot and resume from its state.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    path = Utils.user_path(JOURNAL_FOLDER, f"{ctx.seed_name}_{ctx.slot}.jsonl")
+    if ctx.journal is not None:
+        if ctx.journal.path == path:
+            # Reconnected to the same slot, the state in memory is up to date
+            return
+        ctx.journal.close()
+    ctx.journal = SlotJournal(path)
+    state = ctx.journal.load()
+    logger.debug(f"Resuming slot state from item {state.expected_idx}")
+    ctx.expected_idx = state.expected_idx
+    ctx.latency_idx = state.expected_idx
+    ctx.consumable_idx = state.consumable_idx
+    ctx.received_items_id = Counter()
+    ctx.recount_items = state.expected_idx > 0
+    ctx.item_arrivals.clear()
+    ctx.stored_map = MAIN_MENU_ID if state.stored_map is None else state.stored_map
+    ctx.stored_dim = 0 if state.stored_dim is None else state.stored_dim
+    ctx.scouted_locations = state.scouted
+
+
+async def _journal_state(ctx: SFAContext) -> None:
+    """
+    Journal the slot state committed in this tick.
+
+    Applied consumables are flushed at once, anything else in batches. Flushes run on a separate thread.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    journal = ctx.journal
+    if journal is None:
+        return
+    consumables_applied = ctx.consumable_idx != journal.state.consumable_idx
+    journal.record(
+        SlotState(ctx.expected_idx, ctx.consumable_idx, ctx.stored_map, ctx.stored_dim, ctx.scouted_locations)
+    )
+    if not journal.flush_due(consumables_applied):
+        return
+    try:
+        await asyncio.to_thread(journal.flush, consumables_applied)
+    except OSError as error:
+        # Not worth losing the game connection, a full /sync still works without the journal
+        logger.error(f"Slot state journal disabled: {error}")
+        if ctx.journal is journal:
+            ctx.journal = None
+
+
+def _backend_calls() -> tuple[int, int]:
+    """
+    Count the memory reads and writes done so far.
+
+    :return: Number of backend read calls and write calls, 0 if the backend does not count them
+    """
+    backend = SHADOW.backend
+    if not isinstance(backend, RetryBackend):
+        return 0, 0
+    return backend.stats.count(*BACKEND_READS), backend.stats.count(*BACKEND_WRITES)
+
+
+def _record_tick(ctx: SFAContext, start: float, commit_start: float, end: float, reads: int, writes: int) -> None:
+    """
+    Record the timing and backend calls of a tick.
 
-        ctx.stored_dim = dim_obj_value
+    :param ctx: The Star Fox Adventures context
+    :param start: Loop time of the tick start
+    :param commit_start: Loop time of the commit start
+    :param end: Loop time of the commit end
+    :param reads: Backend read calls before the tick
+    :param writes: Backend write calls before the tick
+    """
+    ctx.perf.add("commit", end - commit_start)
+    ctx.perf.add("tick", end - start)
+    if end - start > TICK_BUDGET:
+        ctx.tick_overruns += 1
+    total_reads, total_writes = _backend_calls()
+    ctx.perf.add("reads", total_reads - reads)
+    ctx.perf.add("writes", total_writes - writes)
+
+
+async def _wait_next_tick(ctx: SFAContext, delay: float) -> None:
+    """
+    Sleep until the next scheduled task, or until items are received.
+
+    :param ctx: The Star Fox Adventures context
+    :param delay: Seconds until the next scheduled task
+    """
+    try:
+        await asyncio.wait_for(ctx.delivery_event.wait(), delay)
+    except asyncio.TimeoutError:
+        return
+    ctx.delivery_event.clear()
+    ctx.scheduler.trigger("items")
 
 
 async def game_watcher(ctx: SFAContext):
@@ -570,36 +1278,107 @@ async def game_watcher(ctx: SFAContext):
 
     :param ctx: The Star Fox Adventures context
     """
+    loop = asyncio.get_running_loop()
     while not ctx.exit_event.is_set():
         try:
-            if not dme.is_hooked() or ctx.slot is None:
+            if not await memory_job(ctx, PRIORITY_LOCATIONS, SHADOW.backend.is_hooked) or ctx.slot is None:
                 await asyncio.sleep(1)
                 continue
 
-            await force_gameflags(ctx)
-            await locations_watcher(ctx)
-            await give_items(ctx)
-            await special_map_flags(ctx)
-
-            if ctx.victory and not ctx.finished_game:
-                await ctx.send_msgs([{"cmd": "StatusUpdate", "status": ClientStatus.CLIENT_GOAL}])
-                ctx.finished_game = True
-
-            await asyncio.sleep(0.1)
+            scheduler = ctx.scheduler
+            now = loop.time()
+            tasks = scheduler.due(now)
+            if tasks:
+                reads, writes = _backend_calls()
+                cutscene_playing, changed = await memory_job(ctx, PRIORITY_LOCATIONS, _begin_tick)
+                ctx.perf.add("refresh", loop.time() - now)
+                if scheduler.record_refresh(changed):
+                    # Back from idle, run everything in this tick
+                    tasks = scheduler.due(now)
+                for task in tasks:
+                    await scheduler.run(task, now, loop.time)
+                await ctx.cutscene_deferral.release(cutscene_playing)
+                commit_start = loop.time()
+                await memory_job(ctx, PRIORITY_DELIVERY, SHADOW.commit)
+                _record_tick(ctx, now, commit_start, loop.time(), reads, writes)
+                ctx.tick_errors = 0
+                _record_delivery_latency(ctx)
+                await _journal_state(ctx)
+
+                if ctx.victory and not ctx.finished_game:
+                    ctx.outbox.update_status(ClientStatus.CLIENT_GOAL)
+
+            await _wait_next_tick(ctx, scheduler.delay(loop.time()))
         except Exception:
             logger.debug(traceback.format_exc())
-            dme.un_hook()
+            ctx.tick_errors += 1
+            if ctx.tick_errors < MAX_TICK_ERRORS and await memory_job(ctx, PRIORITY_DELIVERY, SHADOW.backend.is_hooked):
+                # Still attached, resynchronize on the next tick instead of hooking Dolphin again
+                await memory_job(ctx, PRIORITY_DELIVERY, SHADOW.invalidate)
+                ctx.full_location_scan = True
+                ctx.full_item_sync = True
+                ctx.scheduler.wake()
+                continue
+            ctx.tick_errors = 0
+            await memory_job(ctx, PRIORITY_DELIVERY, _un_hook)
             ctx.dolphin_status = CONNECTION_LOST_STATUS
+            ctx.detached_at = time.monotonic()
+
+
+async def _wait_for_dolphin(ctx: SFAContext, delay: float) -> None:
+    """
+    Wait before the next hook attempt, or until Dolphin starts.
+
+    While the backend knows Dolphin is not running, no hook is attempted and Dolphin is polled instead.
+
+    :param ctx: The Star Fox Adventures context
+    :param delay: Seconds to wait while Dolphin is running
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + delay
+    available = await memory_job(ctx, PRIORITY_DELIVERY, SHADOW.backend.is_available)
+    while not ctx.exit_event.is_set():
+        remaining = deadline - loop.time()
+        if available and remaining <= 0:
+            return
+        await asyncio.sleep(min(DOLPHIN_POLL_INTERVAL, remaining) if available else DOLPHIN_POLL_INTERVAL)
+        started = await memory_job(ctx, PRIORITY_DELIVERY, SHADOW.backend.is_available)
+        if started and not available:
+            return
+        available = started
+
+
+def _dolphin_attached(ctx: SFAContext) -> None:
+    """
+    Resynchronize everything after attaching to Dolphin, and record the time to reattach.
+
+    :param ctx: The Star Fox Adventures context
+    """
+    logger.info(CONNECTION_CONNECTED_STATUS)
+    ctx.dolphin_status = CONNECTION_CONNECTED_STATUS
+    ctx.locations_checked = set()
+    ctx.full_location_scan = True
+    ctx.full_item_sync = True
+    ctx.flags_forced = False
+    ctx.scheduler.wake()
+    if ctx.detached_at is not None:
+        reattach_time = time.monotonic() - ctx.detached_at
+        ctx.reattach_times.add(reattach_time)
+        logger.debug(f"Reattached to Dolphin in {reattach_time:.2f} s")
+        ctx.detached_at = None
 
 
 async def dolphin_sync_task(ctx: SFAContext) -> None:
     """
     Task to manage the connection and synchronization with the Dolphin emulator.
 
+    Failed attempts are retried with an exponential backoff, immediately once Dolphin starts.
+
     :param ctx: The Star Fox Adventures context
     """
     logger.info("Starting Dolphin connector. Use /dolphin for status information.")
     sleep_time = 0.0
+    reconnect_delay = RECONNECT_MIN_DELAY
     while not ctx.exit_event.is_set():
         if sleep_time > 0.0:
             try:
@@ -611,41 +1390,39 @@ async def dolphin_sync_task(ctx: SFAContext) -> None:
         ctx.watcher_event.clear()
 
         try:
-            if dme.is_hooked() and ctx.dolphin_status == CONNECTION_CONNECTED_STATUS:
+            hooked = await memory_job(ctx, PRIORITY_LOCATIONS, SHADOW.backend.is_hooked)
+            if hooked and ctx.dolphin_status == CONNECTION_CONNECTED_STATUS:
                 if ctx.awaiting_rom:
                     logger.info("Connected to Dolphin")
                     await ctx.server_auth()
                 sleep_time = 0.1
+                continue
+            if ctx.dolphin_status == CONNECTION_CONNECTED_STATUS:
+                logger.info("Connection to Dolphin lost, reconnecting...")
+                ctx.dolphin_status = CONNECTION_LOST_STATUS
+            if ctx.detached_at is None and ctx.dolphin_status == CONNECTION_LOST_STATUS:
+                ctx.detached_at = time.monotonic()
+            logger.debug("Attempting to connect to Dolphin...")
+            connected = await memory_job(ctx, PRIORITY_DELIVERY, _hook_dolphin)
+            if connected:
+                _dolphin_attached(ctx)
+                reconnect_delay = RECONNECT_MIN_DELAY
+                continue
+            if connected is None:
+                status = CONNECTION_LOST_STATUS
+                logger.debug(await memory_job(ctx, PRIORITY_DELIVERY, SHADOW.backend.get_status))
             else:
-                if ctx.dolphin_status == CONNECTION_CONNECTED_STATUS:
-                    logger.info("Connection to Dolphin lost, reconnecting...")
-                    ctx.dolphin_status = CONNECTION_LOST_STATUS
-                logger.info("Attempting to connect to Dolphin...")
-                dme.hook()
-                if dme.is_hooked():
-                    if dme.read_bytes(0x80000000, 6) != b"GSAE01":
-                        logger.info(CONNECTION_REFUSED_GAME_STATUS)
-                        ctx.dolphin_status = CONNECTION_REFUSED_GAME_STATUS
-                        dme.un_hook()
-                        await asyncio.sleep(5)
-                    else:
-                        logger.info(CONNECTION_CONNECTED_STATUS)
-                        ctx.dolphin_status = CONNECTION_CONNECTED_STATUS
-                        ctx.locations_checked = set()
-                else:
-                    logger.info("Connection to Dolphin failed, attempting again in 5 seconds...")
-                    dme_status = dme.get_status()
-                    logger.info(dme_status)
-                    ctx.dolphin_status = CONNECTION_LOST_STATUS
-                    await asyncio.sleep(5)
-                    continue
+                status = CONNECTION_REFUSED_GAME_STATUS
+            if ctx.dolphin_status != status:
+                logger.info(status)
+                ctx.dolphin_status = status
         except Exception:
-            dme.un_hook()
-            logger.info("Connection to Dolphin failed, attempting again in 5 seconds...")
+            await memory_job(ctx, PRIORITY_DELIVERY, _un_hook)
             logger.error(traceback.format_exc())
             ctx.dolphin_status = CONNECTION_LOST_STATUS
-            await asyncio.sleep(5)
-            continue
+        logger.debug(f"Connection to Dolphin failed, attempting again in {reconnect_delay:.1f} seconds...")
+        await _wait_for_dolphin(ctx, reconnect_delay)
+        reconnect_delay = min(reconnect_delay * 2, RECONNECT_MAX_DELAY)
 
 
 def main(*launch_args: str):
@@ -655,7 +1432,21 @@ def main(*launch_args: str):
     :param launch_args: Command-line arguments for the client
     """
     parser = get_base_parser()
+    parser.add_argument(
+        "--memory-backend",
+        default="dme",
+        choices=sorted(BACKENDS),
+        help="Memory backend used to access the game, 'fake' runs without an emulator.",
+    )
+    parser.add_argument("--metrics-file", default=None, help="Export client metrics to this file.")
+    parser.add_argument(
+        "--metrics-format",
+        default="prometheus",
+        choices=METRICS_FORMATS,
+        help="Format of the metrics file, a Prometheus textfile or one JSON object per line.",
+    )
     args = parser.parse_args(launch_args)
+    SHADOW.backend = RetryBackend(BACKENDS[args.memory_backend]())
 
     async def _main(connect, password):
         """
@@ -665,6 +1456,7 @@ def main(*launch_args: str):
         :param password: The password for server authentication
         """
         ctx = SFAContext(connect, password)
+        ctx.memory_worker.start()
         ctx.server_task = asyncio.create_task(server_loop(ctx), name="ServerLoop")
 
         if gui_enabled:
@@ -674,6 +1466,11 @@ def main(*launch_args: str):
 
         ctx.dolphin_sync_task = asyncio.create_task(dolphin_sync_task(ctx), name="SmsDolphinSync")
         progression_watcher = asyncio.create_task(game_watcher(ctx), name="SmsProgressionWatcher")
+        outbox_task = asyncio.create_task(ctx.outbox.run(), name="SFAOutbox")
+        metrics_task = None
+        if args.metrics_file:
+            exporter = MetricsExporter(args.metrics_file, args.metrics_format)
+            metrics_task = asyncio.create_task(exporter.run(partial(_collect_metrics, ctx)), name="SFAMetrics")
 
         await ctx.exit_event.wait()
         ctx.server_address = None
@@ -686,6 +1483,14 @@ def main(*launch_args: str):
         if progression_watcher:
             await progression_watcher
 
+        outbox_task.cancel()
+        if metrics_task:
+            metrics_task.cancel()
+
+        ctx.memory_worker.stop()
+        if ctx.journal is not None:
+            ctx.journal.close()
+
     asyncio.run(_main(args.connect, args.password))
 
 
@@ -0,0 +1,813 @@
+import ctypes
+import mmap
+import os
+import sys
+import time
+from collections.abc import Iterable
+
+from .perf import PerfStats
+
+try:
+    import dolphin_memory_engine as dme
+except ModuleNotFoundError:
+    dme = None
+
+#: Start and size of the GameCube main memory (MEM1)
+MEM1_ADDRESS = 0x80000000
+MEM1_SIZE = 0x01800000
+
+#: Game ID of Star Fox Adventures US 1.0, stored at the start of MEM1
+GAME_ID = b"GSAE01"
+
+#: Name prefix of the shared memory object holding Dolphin emulated RAM on Linux
+SHM_PREFIX = "dolphin-emu."
+
+#: Maximum number of spans in a single process_vm_readv/process_vm_writev call
+IOV_MAX = 1024
+
+#: Attempts of a memory access failing while the emulator is still hooked
+TRANSIENT_ATTEMPTS = 3
+#: Seconds between two attempts of a failing memory access
+TRANSIENT_RETRY_DELAY = 0.002
+
+
+class _IoVec(ctypes.Structure):
+    """struct iovec used by process_vm_readv and process_vm_writev."""
+
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+if sys.platform == "linux":
+    _libc = ctypes.CDLL(None, use_errno=True)
+    for _function in (_libc.process_vm_readv, _libc.process_vm_writev):
+        _function.restype = ctypes.c_ssize_t
+        _function.argtypes = [
+            ctypes.c_int,
+            ctypes.POINTER(_IoVec),
+            ctypes.c_ulong,
+            ctypes.POINTER(_IoVec),
+            ctypes.c_ulong,
+            ctypes.c_ulong,
+        ]
+else:
+    _libc = None
+
+
+def find_dolphin_pids() -> list[int]:
+    """
+    Find the running Dolphin processes.
+
+    :return: Process IDs
+    """
+    pids = []
+    try:
+        names = os.listdir("/proc")
+    except OSError:
+        return pids
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/comm") as file:
+                if file.read().startswith("dolphin-emu"):
+                    pids.append(int(name))
+        except OSError:
+            continue
+    return pids
+
+
+def _find_shm_descriptor(pid: int) -> str | None:
+    """
+    Find the file descriptor a Dolphin process keeps on its shared memory object.
+
+    :param pid: Dolphin process ID
+    :return: Path of the descriptor under /proc, None if not found
+    """
+    try:
+        descriptors = os.listdir(f"/proc/{pid}/fd")
+    except OSError:
+        return None
+    for descriptor in descriptors:
+        path = f"/proc/{pid}/fd/{descriptor}"
+        try:
+            target = os.readlink(path)
+        except OSError:
+            continue
+        if os.path.basename(target).startswith(SHM_PREFIX):
+            return path
+    return None
+
+
+def _find_mem1_mapping(pid: int) -> str | None:
+    """
+    Find the mapping of the shared memory object holding MEM1 in a Dolphin process.
+
+    :param pid: Dolphin process ID
+    :return: Address range of the mapping as in /proc/<pid>/maps, None if not found
+    """
+    try:
+        with open(f"/proc/{pid}/maps") as file:
+            for line in file:
+                # The path is followed by (deleted) once the object is unlinked
+                fields = line.split()
+                if len(fields) < 6 or SHM_PREFIX not in fields[5] or int(fields[2], 16) != 0:
+                    continue
+                start, end = (int(value, 16) for value in fields[0].split("-"))
+                if end - start >= MEM1_SIZE:
+                    return fields[0]
+    except OSError:
+        return None
+    return None
+
+
+def _shm_pid(path: str) -> int | None:
+    """
+    Return the Dolphin process owning a shared memory object.
+
+    :param path: Path of the object, under /proc or named after the process
+    :return: Process ID, None if the path does not tell
+    """
+    parts = path.split("/")
+    if len(parts) > 2 and parts[1] == "proc" and parts[2].isdigit():
+        return int(parts[2])
+    name = os.path.basename(path)
+    pid = name.removeprefix(SHM_PREFIX)
+    return int(pid) if name.startswith(SHM_PREFIX) and pid.isdigit() else None
+
+
+class MemoryBackend:
+    """Base class for access to the emulated GameCube memory."""
+
+    name = ""
+
+    def hook(self) -> None:
+        """Connect to the emulator."""
+        raise NotImplementedError
+
+    def un_hook(self) -> None:
+        """Disconnect from the emulator."""
+        raise NotImplementedError
+
+    def is_hooked(self) -> bool:
+        """
+        Return the connection state.
+
+        :return: True if connected to the emulator
+        """
+        raise NotImplementedError
+
+    def is_available(self) -> bool:
+        """
+        Return whether the emulator seems to be running, so hooking it is worth trying.
+
+        :return: True unless the emulator is known not to run
+        """
+        return True
+
+    def get_status(self) -> str:
+        """
+        Return a description of the connection state.
+
+        :return: Status message
+        """
+        return "Hooked" if self.is_hooked() else "Not hooked"
+
+    def read_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read bytes from memory.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        raise NotImplementedError
+
+    def write_bytes(self, address: int, data: bytes) -> None:
+        """
+        Write bytes to memory.
+
+        :param address: Start address
+        :param data: Bytes to write
+        """
+        raise NotImplementedError
+
+    def read_byte(self, address: int) -> int:
+        """
+        Read a single byte from memory.
+
+        :param address: Byte address
+        :return: Byte value
+        """
+        return self.read_bytes(address, 1)[0]
+
+    def read_spans(self, spans: Iterable[tuple[int, int]]) -> list[bytes]:
+        """
+        Read several memory spans.
+
+        :param spans: Iterable of (address, size) spans
+        :return: Bytes read for each span
+        """
+        return [self.read_bytes(address, size) for address, size in spans]
+
+    def write_spans(self, spans: Iterable[tuple[int, bytes]]) -> None:
+        """
+        Write several memory spans.
+
+        :param spans: Iterable of (address, data) spans
+        """
+        for address, data in spans:
+            self.write_bytes(address, data)
+
+
+class DmeBackend(MemoryBackend):
+    """Memory access through the dolphin_memory_engine module."""
+
+    name = "dme"
+
+    def hook(self) -> None:
+        """Connect to the emulator."""
+        if dme is None:
+            raise RuntimeError("dolphin_memory_engine is not installed")
+        dme.hook()
+
+    def un_hook(self) -> None:
+        """Disconnect from the emulator."""
+        if dme is not None:
+            dme.un_hook()
+
+    def is_hooked(self) -> bool:
+        """
+        Return the connection state.
+
+        :return: True if connected to the emulator
+        """
+        return dme is not None and dme.is_hooked()
+
+    def get_status(self) -> str:
+        """
+        Return a description of the connection state.
+
+        :return: Status message
+        """
+        if dme is None:
+            return "dolphin_memory_engine is not installed"
+        return dme.get_status()
+
+    def read_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read bytes from memory.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        return dme.read_bytes(address, nb_bytes)
+
+    def write_bytes(self, address: int, data: bytes) -> None:
+        """
+        Write bytes to memory.
+
+        :param address: Start address
+        :param data: Bytes to write
+        """
+        dme.write_bytes(address, data)
+
+    def read_byte(self, address: int) -> int:
+        """
+        Read a single byte from memory.
+
+        :param address: Byte address
+        :return: Byte value
+        """
+        return dme.read_byte(address)
+
+
+class FakeBackend(MemoryBackend):
+    """In-process GameCube MEM1, to run the client without an emulator."""
+
+    name = "fake"
+
+    def __init__(self, game_id: bytes = GAME_ID):
+        """
+        Initialize the fake memory with the game header.
+
+        :param game_id: Game ID written at the start of MEM1
+        """
+        self.ram = bytearray(MEM1_SIZE)
+        self.ram[: len(game_id)] = game_id
+        self.hooked = False
+
+    def hook(self) -> None:
+        """Connect to the emulator."""
+        self.hooked = True
+
+    def un_hook(self) -> None:
+        """Disconnect from the emulator."""
+        self.hooked = False
+
+    def is_hooked(self) -> bool:
+        """
+        Return the connection state.
+
+        :return: True if connected to the emulator
+        """
+        return self.hooked
+
+    def _index(self, address: int, nb_bytes: int) -> int:
+        """
+        Return the RAM index of an address.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes accessed
+        :return: Index in the RAM buffer
+        """
+        if not self.hooked:
+            raise RuntimeError("Fake memory is not hooked")
+        index = address - MEM1_ADDRESS
+        if index < 0 or index + nb_bytes > MEM1_SIZE:
+            raise RuntimeError(f"Address {address:#x} is outside of MEM1")
+        return index
+
+    def read_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read bytes from memory.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        index = self._index(address, nb_bytes)
+        return bytes(self.ram[index : index + nb_bytes])
+
+    def write_bytes(self, address: int, data: bytes) -> None:
+        """
+        Write bytes to memory.
+
+        :param address: Start address
+        :param data: Bytes to write
+        """
+        index = self._index(address, len(data))
+        self.ram[index : index + len(data)] = data
+
+
+class ShmBackend(MemoryBackend):
+    """
+    Memory access through Dolphin shared memory on Linux.
+
+    MEM1 sits at the start of the dolphin-emu.<pid> shared memory object, it is mapped in the client process so reads
+    and writes are plain memory accesses without any system call.
+    """
+
+    name = "shm"
+
+    def __init__(self, path: str | None = None):
+        """
+        Initialize the backend.
+
+        :param path: File to map instead of searching for a running Dolphin
+        """
+        self.path = path
+        self.mapped_path: str | None = None
+        #: Dolphin process owning the mapped memory, None if unknown
+        self.mapped_pid: int | None = None
+        self._file = None
+        self._mmap: mmap.mmap | None = None
+        self._view: memoryview | None = None
+
+    @staticmethod
+    def find_dolphin_shm() -> str | None:
+        """
+        Find the shared memory object of the most recently started running Dolphin.
+
+        Dolphin unlinks the object right after creating it, so it is opened through the file descriptor Dolphin keeps
+        on it, or through its memory mapping if the descriptor is not found.
+
+        :return: Path of the shared memory object under /proc, None if Dolphin is not running
+        """
+        for pid in sorted(find_dolphin_pids(), reverse=True):
+            path = _find_shm_descriptor(pid)
+            if path is not None:
+                return path
+            mapping = _find_mem1_mapping(pid)
+            if mapping is not None:
+                return f"/proc/{pid}/map_files/{mapping}"
+        return None
+
+    def is_available(self) -> bool:
+        """
+        Return whether the emulator seems to be running, so hooking it is worth trying.
+
+        :return: True if a Dolphin shared memory object exists
+        """
+        return self.path is not None or self.find_dolphin_shm() is not None
+
+    def hook(self) -> None:
+        """Map MEM1 of the running Dolphin."""
+        self.un_hook()
+        path = self.path or self.find_dolphin_shm()
+        if path is None:
+            return
+        file = open(path, "r+b")  # noqa: SIM115
+        try:
+            if os.fstat(file.fileno()).st_size < MEM1_SIZE:
+                raise RuntimeError(f"{path} is smaller than MEM1")
+            self._mmap = mmap.mmap(file.fileno(), MEM1_SIZE)
+        except Exception:
+            file.close()
+            raise
+        self._file = file
+        self._view = memoryview(self._mmap)
+        self.mapped_path = path
+        self.mapped_pid = _shm_pid(path)
+
+    def un_hook(self) -> None:
+        """Unmap Dolphin memory."""
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A view is still exported, the mapping is closed once it is released
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self.mapped_path = None
+        self.mapped_pid = None
+
+    def is_hooked(self) -> bool:
+        """
+        Return the connection state.
+
+        :return: True if Dolphin memory is mapped and Dolphin is still running
+        """
+        # The mapping outlives Dolphin, the process is checked to notice the emulator was closed
+        return self._view is not None and (self.mapped_pid is None or os.path.exists(f"/proc/{self.mapped_pid}"))
+
+    def get_status(self) -> str:
+        """
+        Return a description of the connection state.
+
+        :return: Status message
+        """
+        if self.mapped_path is not None:
+            return f"Mapped {self.mapped_path}"
+        return "Dolphin shared memory not found"
+
+    def view(self, address: int, nb_bytes: int) -> memoryview:
+        """
+        Return a view over emulated memory, without copying it.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes in the view
+        :return: Memory view, writes to it go directly to the game
+        """
+        if self._view is None:
+            raise RuntimeError("Dolphin shared memory is not mapped")
+        index = address - MEM1_ADDRESS
+        if index < 0 or index + nb_bytes > MEM1_SIZE:
+            raise RuntimeError(f"Address {address:#x} is outside of MEM1")
+        return self._view[index : index + nb_bytes]
+
+    def read_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read bytes from memory.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        return self.view(address, nb_bytes).tobytes()
+
+    def read_byte(self, address: int) -> int:
+        """
+        Read a single byte from memory.
+
+        :param address: Byte address
+        :return: Byte value
+        """
+        return self.view(address, 1)[0]
+
+    def read_spans(self, spans: Iterable[tuple[int, int]]) -> list[memoryview]:
+        """
+        Return views over several memory spans.
+
+        :param spans: Iterable of (address, size) spans
+        :return: Memory view for each span
+        """
+        return [self.view(address, size) for address, size in spans]
+
+    def write_bytes(self, address: int, data: bytes) -> None:
+        """
+        Write bytes to memory.
+
+        :param address: Start address
+        :param data: Bytes to write, already in the big-endian order of the game
+        """
+        self.view(address, len(data))[:] = data
+
+
+class ProcessVmBackend(MemoryBackend):
+    """
+    Memory access to the Dolphin process on Linux with vectored process_vm_readv/process_vm_writev calls.
+
+    A whole tick read plan or all dirty spans of a commit are transferred in a single system call.
+    """
+
+    name = "vm"
+
+    def __init__(self, pid: int | None = None, ram_base: int | None = None):
+        """
+        Initialize the backend.
+
+        :param pid: Process to attach to instead of searching for a running Dolphin
+        :param ram_base: Address of MEM1 in the process instead of searching its memory maps
+        """
+        self.pid = pid
+        self.ram_base = ram_base
+        self._pid: int | None = None
+        self._base = 0
+
+    @staticmethod
+    def find_dolphin_pid() -> int | None:
+        """
+        Find the most recently started running Dolphin process.
+
+        :return: Process ID, None if Dolphin is not running
+        """
+        return max(find_dolphin_pids(), default=None)
+
+    @staticmethod
+    def find_ram_base(pid: int) -> int | None:
+        """
+        Find where MEM1 is mapped in the Dolphin process.
+
+        :param pid: Dolphin process ID
+        :return: Address of MEM1 in the process, None if not found
+        """
+        mapping = _find_mem1_mapping(pid)
+        return int(mapping.split("-")[0], 16) if mapping is not None else None
+
+    def is_available(self) -> bool:
+        """
+        Return whether the emulator seems to be running, so hooking it is worth trying.
+
+        :return: True if a Dolphin process exists
+        """
+        return self.pid is not None or self.find_dolphin_pid() is not None
+
+    def hook(self) -> None:
+        """Attach to the running Dolphin."""
+        self.un_hook()
+        if _libc is None:
+            raise RuntimeError("process_vm_readv is only available on Linux")
+        pid = self.pid or self.find_dolphin_pid()
+        if pid is None:
+            return
+        base = self.ram_base or self.find_ram_base(pid)
+        if base is None:
+            return
+        self._pid = pid
+        self._base = base
+
+    def un_hook(self) -> None:
+        """Detach from Dolphin."""
+        self._pid = None
+
+    def is_hooked(self) -> bool:
+        """
+        Return the connection state.
+
+        :return: True if attached to a running process
+        """
+        return self._pid is not None and os.path.exists(f"/proc/{self._pid}")
+
+    def get_status(self) -> str:
+        """
+        Return a description of the connection state.
+
+        :return: Status message
+        """
+        if self._pid is not None:
+            return f"Attached to process {self._pid}, MEM1 at {self._base:#x}"
+        return "Dolphin process not found"
+
+    def _remote_address(self, address: int, nb_bytes: int) -> int:
+        """
+        Translate a GameCube address to an address in the Dolphin process.
+
+        :param address: GameCube address
+        :param nb_bytes: Number of bytes accessed
+        :return: Address in the Dolphin process
+        """
+        if self._pid is None:
+            raise RuntimeError("Dolphin process is not attached")
+        index = address - MEM1_ADDRESS
+        if index < 0 or index + nb_bytes > MEM1_SIZE:
+            raise RuntimeError(f"Address {address:#x} is outside of MEM1")
+        return self._base + index
+
+    def _transfer(self, function, local: list[_IoVec], remote: list[_IoVec], expected: int) -> None:
+        """
+        Run a vectored transfer with the Dolphin process.
+
+        :param function: process_vm_readv or process_vm_writev
+        :param local: Buffers in the client process
+        :param remote: Spans in the Dolphin process
+        :param expected: Total number of bytes to transfer
+        """
+        for start in range(0, len(remote), IOV_MAX):
+            local_chunk = local[start : start + IOV_MAX]
+            remote_chunk = remote[start : start + IOV_MAX]
+            local_array = (_IoVec * len(local_chunk))(*local_chunk)
+            remote_array = (_IoVec * len(remote_chunk))(*remote_chunk)
+            result = function(self._pid, local_array, len(local_chunk), remote_array, len(remote_chunk), 0)
+            if result < 0:
+                error = ctypes.get_errno()
+                raise OSError(error, os.strerror(error))
+            expected -= result
+        if expected != 0:
+            raise RuntimeError("Partial transfer with the Dolphin process")
+
+    def read_spans(self, spans: Iterable[tuple[int, int]]) -> list[bytes]:
+        """
+        Read several memory spans in a single system call.
+
+        :param spans: Iterable of (address, size) spans
+        :return: Bytes read for each span
+        """
+        spans = list(spans)
+        buffers = [ctypes.create_string_buffer(size) for _, size in spans]
+        local = [_IoVec(ctypes.addressof(buffer), size) for buffer, (_, size) in zip(buffers, spans, strict=True)]
+        remote = [_IoVec(self._remote_address(address, size), size) for address, size in spans]
+        self._transfer(_libc.process_vm_readv, local, remote, sum(size for _, size in spans))
+        return [buffer.raw for buffer in buffers]
+
+    def write_spans(self, spans: Iterable[tuple[int, bytes]]) -> None:
+        """
+        Write several memory spans in a single system call.
+
+        :param spans: Iterable of (address, data) spans
+        """
+        spans = list(spans)
+        buffers = [ctypes.create_string_buffer(bytes(data), len(data)) for _, data in spans]
+        local = [_IoVec(ctypes.addressof(buffer), len(buffer)) for buffer in buffers]
+        remote = [_IoVec(self._remote_address(address, len(data)), len(data)) for address, data in spans]
+        self._transfer(_libc.process_vm_writev, local, remote, sum(len(data) for _, data in spans))
+
+    def read_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read bytes from memory.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        return self.read_spans([(address, nb_bytes)])[0]
+
+    def write_bytes(self, address: int, data: bytes) -> None:
+        """
+        Write bytes to memory.
+
+        :param address: Start address
+        :param data: Bytes to write
+        """
+        self.write_spans([(address, data)])
+
+
+class RetryBackend(MemoryBackend):
+    """
+    Backend retrying memory accesses that fail while the emulator is still hooked, and timing them.
+
+    Such errors are transient, for example while the emulator remaps memory, and are retried within the same call.
+    Errors once the emulator is no longer hooked are raised at once.
+    """
+
+    def __init__(
+        self, backend: MemoryBackend, attempts: int = TRANSIENT_ATTEMPTS, delay: float = TRANSIENT_RETRY_DELAY
+    ):
+        """
+        Initialize the backend.
+
+        :param backend: Backend accessing the memory
+        :param attempts: Attempts of a failing memory access
+        :param delay: Seconds between two attempts
+        """
+        self.backend = backend
+        self.name = backend.name
+        self.attempts = attempts
+        self.delay = delay
+        #: Memory accesses that failed and were retried
+        self.transient_errors = 0
+        #: Duration of the memory accesses by function name, retries included
+        self.stats = PerfStats()
+
+    def _retry(self, function, *args):
+        """
+        Call a memory access function, retrying transient errors.
+
+        :param function: Function of the wrapped backend
+        :param args: Arguments of the function
+        :return: Result of the function
+        """
+        start = time.perf_counter()
+        try:
+            for attempt in range(1, self.attempts + 1):
+                try:
+                    return function(*args)
+                except (OSError, RuntimeError):
+                    if attempt == self.attempts or not self.backend.is_hooked():
+                        raise
+                    self.transient_errors += 1
+                    time.sleep(self.delay)
+        finally:
+            self.stats.add(function.__name__, time.perf_counter() - start)
+
+    def hook(self) -> None:
+        """Connect to the emulator."""
+        self.backend.hook()
+
+    def un_hook(self) -> None:
+        """Disconnect from the emulator."""
+        self.backend.un_hook()
+
+    def is_hooked(self) -> bool:
+        """
+        Return the connection state.
+
+        :return: True if connected to the emulator
+        """
+        return self.backend.is_hooked()
+
+    def is_available(self) -> bool:
+        """
+        Return whether the emulator seems to be running, so hooking it is worth trying.
+
+        :return: True unless the emulator is known not to run
+        """
+        return self.backend.is_available()
+
+    def get_status(self) -> str:
+        """
+        Return a description of the connection state.
+
+        :return: Status message
+        """
+        return self.backend.get_status()
+
+    def read_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read bytes from memory.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        return self._retry(self.backend.read_bytes, address, nb_bytes)
+
+    def write_bytes(self, address: int, data: bytes) -> None:
+        """
+        Write bytes to memory.
+
+        :param address: Start address
+        :param data: Bytes to write
+        """
+        self._retry(self.backend.write_bytes, address, data)
+
+    def read_byte(self, address: int) -> int:
+        """
+        Read a single byte from memory.
+
+        :param address: Byte address
+        :return: Byte value
+        """
+        return self._retry(self.backend.read_byte, address)
+
+    def read_spans(self, spans: Iterable[tuple[int, int]]) -> list[bytes]:
+        """
+        Read several memory spans.
+
+        :param spans: Iterable of (address, size) spans
+        :return: Bytes read for each span
+        """
+        return self._retry(self.backend.read_spans, list(spans))
+
+    def write_spans(self, spans: Iterable[tuple[int, bytes]]) -> None:
+        """
+        Write several memory spans.
+
+        :param spans: Iterable of (address, data) spans
+        """
+        self._retry(self.backend.write_spans, list(spans))
+
+
+#: Available backends by name
+BACKENDS: dict[str, type[MemoryBackend]] = {
+    DmeBackend.name: DmeBackend,
+    FakeBackend.name: FakeBackend,
+    ShmBackend.name: ShmBackend,
+    ProcessVmBackend.name: ProcessVmBackend,
+}
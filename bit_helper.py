@@ -1,8 +1,20 @@
+from collections.abc import Iterable
 from typing import Literal
 
-import dolphin_memory_engine as dme
 from CommonClient import logger
 
+from .addresses import GameFlag
+from .memory import SHADOW
+
+
+#: ON flag positions for every byte value, highest bit first
+_BYTE_FLAGS: tuple[tuple[int, ...], ...] = tuple(
+    tuple(position for position in range(7, -1, -1) if value >> position & 1) for value in range(256)
+)
+
+#: Masks keeping every bit but one for each bit position
+_CLEAR_MASKS: tuple[int, ...] = tuple(~(1 << position) & 0xFF for position in range(8))
+
 
 def extract_bitflag_list(input_bytes: int) -> list[int]:
     """
@@ -11,8 +23,14 @@ def extract_bitflag_list(input_bytes: int) -> list[int]:
     :param input_bytes: Input bytes to extract flags
     :return: List of ON flag index
     """
-    string_bytes = padded_string_byte(input_bytes)
-    return [len(string_bytes) - 1 - i for i in range(len(string_bytes)) if string_bytes[i] == "1"]
+    if input_bytes < 0x100:
+        return list(_BYTE_FLAGS[input_bytes])
+    flags: list[int] = []
+    for base in range((input_bytes.bit_length() - 1) & ~7, -1, -8):
+        byte = input_bytes >> base & 0xFF
+        if byte:
+            flags += [base + position for position in _BYTE_FLAGS[byte]]
+    return flags
 
 
 def extract_bits_value(input_bytes: int, offset: int = 0, size: int = 8) -> int:
@@ -24,8 +42,7 @@ def extract_bits_value(input_bytes: int, offset: int = 0, size: int = 8) -> int:
     :param size: Number of bits to read
     :return: Integer value of extracted bits
     """
-    value = input_bytes >> offset
-    return value & 2**size - 1
+    return input_bytes >> offset & ((1 << size) - 1)
 
 
 def swap_endian(bytes: int, nb_bytes: int = 4) -> int:
@@ -47,7 +64,7 @@ def get_bit_address(table: int, offset: int) -> tuple[int, int]:
     :param offset: Integer bit offset
     :return: Address, offset in address byte
     """
-    return table + int(offset / 8), offset % 8
+    return table + (offset >> 3), offset & 7
 
 
 def padded_string_byte(input_byte: int | bool, padding_size: int = 8) -> str:
@@ -58,10 +75,8 @@ def padded_string_byte(input_byte: int | bool, padding_size: int = 8) -> str:
     :param padding_size: Length of output string
     :return: String value of input with required length
     """
-    temp_str = str(bin(input_byte)).removeprefix("0b")
-    while len(temp_str) % padding_size != 0:
-        temp_str = "0" + temp_str
-    return temp_str
+    temp_str = format(input_byte, "b")
+    return temp_str.zfill(-(-len(temp_str) // padding_size) * padding_size)
 
 
 def update_bits(input_byte: int, start_offset: int, value: int | bool, size: int = 1) -> int:
@@ -74,13 +89,9 @@ def update_bits(input_byte: int, start_offset: int, value: int | bool, size: int
     :param size: Number of bits to update
     :return: Updated byte
     """
-    input_str = padded_string_byte(input_byte)
-    value_str = padded_string_byte(value, size)
-    if len(value_str) > size:
+    if value >> size:
         raise ValueError("Value overflowing bits size")
-    reverse_pos = len(input_str) - start_offset
-    output_str = input_str[: reverse_pos - size] + value_str + input_str[reverse_pos:]
-    return int(output_str, 2)
+    return input_byte & ~(((1 << size) - 1) << start_offset) | value << start_offset
 
 
 def set_on_or_bytes(address: int, value: int, nb_bytes: int) -> None:
@@ -91,9 +102,8 @@ def set_on_or_bytes(address: int, value: int, nb_bytes: int) -> None:
     :param value: Value to compare with memory
     :param size: Number of bytes to update
     """
-    cache_byte = dme.read_bytes(address, nb_bytes)
-    updated_byte = int.from_bytes(cache_byte) | value
-    dme.write_bytes(address, updated_byte.to_bytes(nb_bytes))
+    for i, byte in enumerate(value.to_bytes(nb_bytes)):
+        SHADOW.update_bits(address + i, 0xFF, byte)
 
 
 def read_value_bytes(
@@ -113,7 +123,7 @@ def read_value_bytes(
     if bit_position + value_size > 8 * nb_bytes:
         logger.debug("READ BYTE: Size overflowing into next byte")
         return read_value_bytes(address, offset, value_size, nb_bytes + 1, endian)
-    cache_byte = dme.read_bytes(byte_address, nb_bytes)
+    cache_byte = SHADOW.read_bytes(byte_address, nb_bytes)
     cache_byte = int.from_bytes(cache_byte, endian)
     return extract_bits_value(cache_byte, bit_position, value_size)
 
@@ -141,11 +151,15 @@ def set_value_bytes(
         logger.debug("WRITE BYTE: Size overflowing into next byte")
         set_value_bytes(address, offset, value, value_size, nb_bytes + 1, endian)
         return
-    cache_byte = dme.read_bytes(byte_address, nb_bytes)
-    cache_byte = int.from_bytes(cache_byte, byteorder=endian)
-    updated_byte = update_bits(cache_byte, bit_position, value, value_size)
-    logger.debug(f"Writing byte: {updated_byte:b}")
-    dme.write_bytes(byte_address, updated_byte.to_bytes(nb_bytes, endian))
+    if value >> value_size:
+        raise ValueError("Value overflowing bits size")
+    field_mask = ((1 << value_size) - 1) << bit_position
+    field_value = value << bit_position
+    logger.debug(f"Writing value: {value:b}")
+    and_bytes = (~field_mask & ((1 << 8 * nb_bytes) - 1)).to_bytes(nb_bytes, endian)
+    or_bytes = field_value.to_bytes(nb_bytes, endian)
+    for i in range(nb_bytes):
+        SHADOW.update_bits(byte_address + i, and_bytes[i], or_bytes[i])
 
 
 def set_flag_bit(address: int, offset: int, value: bool) -> None:
@@ -157,6 +171,58 @@ def set_flag_bit(address: int, offset: int, value: bool) -> None:
     :param value: Bit value
     """
     address, bit_position = get_bit_address(address, offset)
-    cache_byte = dme.read_byte(address)
-    updated_byte = update_bits(cache_byte, bit_position, value)
-    dme.write_byte(address, updated_byte)
+    SHADOW.update_bits(address, _CLEAR_MASKS[bit_position], value << bit_position)
+
+
+def read_flag_bit(address: int, offset: int) -> bool:
+    """
+    Read single bit value from memory.
+
+    :param address: Start address
+    :param offset: Bit offset
+    :return: Bit value
+    """
+    address, bit_position = get_bit_address(address, offset)
+    return bool(SHADOW.read_byte(address) >> bit_position & 1)
+
+
+def compile_flag_patch(
+    flags: Iterable[GameFlag], or_bytes: Iterable[tuple[int, int, int]] = ()
+) -> tuple[tuple[int, int, int], ...]:
+    """
+    Compile flags into per byte patches, later flags override earlier ones.
+
+    :param flags: Flags to set to their state
+    :param or_bytes: Address, value and number of bytes to set ON in memory
+    :return: Address, set mask and clear mask of each patched byte, sorted by address
+    """
+    masks: dict[int, list[int]] = {}
+    for address, value, nb_bytes in or_bytes:
+        for i, byte in enumerate(value.to_bytes(nb_bytes)):
+            masks.setdefault(address + i, [0, 0])[0] |= byte
+    for flag in flags:
+        address, bit_position = get_bit_address(flag.table_address, flag.bit_offset)
+        byte_masks = masks.setdefault(address, [0, 0])
+        if flag.state:
+            byte_masks[0] |= 1 << bit_position
+            byte_masks[1] &= _CLEAR_MASKS[bit_position]
+        else:
+            byte_masks[0] &= _CLEAR_MASKS[bit_position]
+            byte_masks[1] |= 1 << bit_position
+    return tuple((address, set_mask, clear_mask) for address, (set_mask, clear_mask) in sorted(masks.items()))
+
+
+def apply_flag_patch(patch: Iterable[tuple[int, int, int]]) -> int:
+    """
+    Write the patched bytes that drifted from the required state.
+
+    :param patch: Address, set mask and clear mask of each patched byte
+    :return: Number of drifted bytes
+    """
+    drift = 0
+    for address, set_mask, clear_mask in patch:
+        byte = SHADOW.read_byte(address)
+        if byte & clear_mask or ~byte & set_mask:
+            SHADOW.update_bits(address, ~clear_mask & 0xFF, set_mask)
+            drift += 1
+    return drift
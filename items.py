@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import Enum, auto
+from types import MappingProxyType
 from typing import TYPE_CHECKING
 
 from BaseClasses import Item, ItemClassification
@@ -52,10 +53,7 @@ class SFAItemData:
         :param id: Item id to search
         :return: SFAItemData for given id
         """
-        for item in ALL_ITEMS_TABLE.values():
-            if item.id == id:
-                return item
-        return None
+        return ITEMS_BY_ID.get(id)
 
     @classmethod
     def get_by_name(cls, name: str) -> SFAItemData | None:
@@ -367,3 +365,6 @@ ALL_ITEMS_TABLE: dict[str, SFAItemData] = {
     **USEFUL_ITEMS,
     **FILLER_ITEMS,
 }
+
+#: Item data by item ID
+ITEMS_BY_ID: MappingProxyType[int, SFAItemData] = MappingProxyType({item.id: item for item in ALL_ITEMS_TABLE.values()})
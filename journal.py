@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+
+#: Seconds between two fsyncs of the journal, unless a flush is forced
+FLUSH_INTERVAL = 1.0
+#: Records appended before the journal is rewritten as a single record
+COMPACT_RECORDS = 1000
+
+
+@dataclass
+class SlotState:
+    """Client state of a slot kept across client restarts."""
+
+    #: Index of the next received item to deliver
+    expected_idx: int = 0
+    #: Index of the first received item whose consumable effect was not applied yet
+    consumable_idx: int = 0
+    #: Last map and DIM zone seen, None if never seen
+    stored_map: int | None = None
+    stored_dim: int | None = None
+    #: Locations already scouted
+    scouted: set[int] = field(default_factory=set)
+
+
+def _apply_record(state: SlotState, record: dict) -> None:
+    """
+    Apply a journal record to a slot state.
+
+    :param state: State to update
+    :param record: Changed fields, scouted locations are added to the state
+    """
+    if "expected_idx" in record:
+        state.expected_idx = record["expected_idx"]
+    if "consumable_idx" in record:
+        state.consumable_idx = record["consumable_idx"]
+    if "map" in record:
+        state.stored_map = record["map"]
+    if "dim" in record:
+        state.stored_dim = record["dim"]
+    state.scouted.update(record.get("scouted", ()))
+
+
+def _diff_record(previous: SlotState, current: SlotState) -> dict:
+    """
+    Build the journal record turning a slot state into another.
+
+    :param previous: State already in the journal
+    :param current: New state
+    :return: Changed fields, empty if the states are equal
+    """
+    record: dict = {}
+    if current.expected_idx != previous.expected_idx:
+        record["expected_idx"] = current.expected_idx
+    if current.consumable_idx != previous.consumable_idx:
+        record["consumable_idx"] = current.consumable_idx
+    if current.stored_map != previous.stored_map:
+        record["map"] = current.stored_map
+    if current.stored_dim != previous.stored_dim:
+        record["dim"] = current.stored_dim
+    if not current.scouted <= previous.scouted:
+        record["scouted"] = sorted(current.scouted - previous.scouted)
+    return record
+
+
+class SlotJournal:
+    """
+    Append-only journal of the client state of a slot, one JSON record per line.
+
+    Records hold the fields changed since the previous one and are fsynced in batches.
+    The journal is rewritten as a single record once it grows past COMPACT_RECORDS, or if a record is damaged.
+    flush() may run on another thread than record(), flushes are written one at a time in the order they are taken.
+    """
+
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL, compact_records: int = COMPACT_RECORDS):
+        """
+        Initialize the journal, call load() to read the state back.
+
+        :param path: Path of the journal file
+        :param flush_interval: Seconds between two fsyncs, unless a flush is forced
+        :param compact_records: Records appended before the journal is compacted
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.compact_records = compact_records
+        #: State as written to the journal, including pending records
+        self.state = SlotState()
+        self._pending: list[str] = []
+        self._records = 0
+        self._last_flush = 0.0
+        #: Guards the pending records and the state, only held briefly
+        self._lock = threading.Lock()
+        #: Held while flushing, so writes to the file never interleave
+        self._write_lock = threading.Lock()
+
+    def load(self) -> SlotState:
+        """
+        Read the journal back.
+
+        :return: Copy of the journaled state, the default state if there is no journal
+        """
+        self.state = SlotState()
+        self._records = 0
+        damaged = False
+        try:
+            with open(self.path, encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        _apply_record(self.state, json.loads(line))
+                    except (ValueError, TypeError, AttributeError):
+                        # Torn write, records hold absolute values so later ones still apply
+                        damaged = True
+                    else:
+                        self._records += 1
+        except FileNotFoundError:
+            pass
+        if damaged:
+            self._replace(self._state_record())
+        return self._copy(self.state)
+
+    def record(self, state: SlotState) -> bool:
+        """
+        Queue a record of the fields changed since the previous record.
+
+        :param state: Current state, it is copied
+        :return: True if anything changed
+        """
+        record = _diff_record(self.state, state)
+        if not record:
+            return False
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._pending.append(line)
+            self.state = self._copy(state)
+        return True
+
+    def flush_due(self, force: bool = False) -> bool:
+        """
+        Return whether flush() would write anything now.
+
+        :param force: Flush even if the previous flush is more recent than the flush interval
+        :return: True if records are queued and the flush interval elapsed or the flush is forced
+        """
+        return bool(self._pending) and (force or time.monotonic() - self._last_flush >= self.flush_interval)
+
+    def flush(self, force: bool = False) -> None:
+        """
+        Write and fsync the queued records.
+
+        :param force: Flush even if the previous flush is more recent than the flush interval
+        """
+        with self._write_lock:
+            with self._lock:
+                if not self.flush_due(force):
+                    return
+                self._last_flush = time.monotonic()
+                pending, self._pending = self._pending, []
+                compact_record = self._state_record() if self._records + len(pending) > self.compact_records else None
+            if compact_record is not None:
+                self._replace(compact_record)
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write("\n".join(pending) + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+            self._records += len(pending)
+
+    def close(self) -> None:
+        """Flush the queued records."""
+        self.flush(force=True)
+
+    def _state_record(self) -> str:
+        """
+        Build a single record of the whole state.
+
+        :return: JSON record
+        """
+        return json.dumps(_diff_record(SlotState(), self.state), separators=(",", ":"))
+
+    def _replace(self, record: str) -> None:
+        """
+        Atomically replace the journal with a single record.
+
+        :param record: JSON record of the whole state
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(record + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._records = 1
+
+    @staticmethod
+    def _copy(state: SlotState) -> SlotState:
+        """Copy a state, so later changes to its containers do not affect the journal."""
+        return SlotState(
+            state.expected_idx, state.consumable_idx, state.stored_map, state.stored_dim, set(state.scouted)
+        )
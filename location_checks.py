@@ -0,0 +1,198 @@
+from collections.abc import Iterable
+
+from .locations import (
+    SFACountLocationData,
+    SFALinkedLocationData,
+    SFALocationData,
+    location_byte_addresses,
+)
+from .memory import ShadowMemory
+
+try:
+    import numpy as np
+except ModuleNotFoundError:
+    np = None
+
+
+def compile_location(location: SFALocationData, memory: ShadowMemory) -> tuple[int, ...]:
+    """
+    Compile a location check into indexes and masks on the shadow memory snapshot.
+
+    :param location: Location data
+    :param memory: Shadow memory watching the location bytes
+    :return: Byte index, number of bytes, shift, mask, threshold, map byte index, map number of bytes, map value
+    """
+    bit_size = location.bit_size if isinstance(location, SFACountLocationData) else 1
+    threshold = location.count if isinstance(location, SFACountLocationData) else 1
+    field_addresses = location_byte_addresses(location)[: (location.bit_offset % 8 + bit_size + 7) // 8]
+    byte_index = memory.locate(field_addresses[0], len(field_addresses))
+    if byte_index is None:
+        raise ValueError(f"Location {location.id} is not in watched memory")
+    map_index, map_nb_bytes, map_value = -1, 0, 0
+    if isinstance(location, SFALinkedLocationData):
+        map_index = memory.locate(location.map_address, location.map_bit_size)
+        if map_index is None:
+            raise ValueError(f"Map value of location {location.id} is not in watched memory")
+        map_nb_bytes, map_value = location.map_bit_size, location.map_value
+    return (
+        byte_index,
+        len(field_addresses),
+        location.bit_offset % 8,
+        (1 << bit_size) - 1,
+        threshold,
+        map_index,
+        map_nb_bytes,
+        map_value,
+    )
+
+
+class LocationChecks:
+    """
+    Flag, count and map linked location checks compiled against the shadow memory snapshot.
+
+    With NumPy, checks are evaluated in a single vectorized pass over packed arrays, otherwise row by row.
+    """
+
+    def __init__(self, locations: Iterable[SFALocationData], memory: ShadowMemory):
+        """
+        Compile the location checks.
+
+        :param locations: Locations to check
+        :param memory: Shadow memory watching the location bytes
+        """
+        self.locations = list(locations)
+        self.rows = [compile_location(location, memory) for location in self.locations]
+        self.vectorized = np is not None
+        self._rows_by_address: dict[int, list[int]] = {}
+        for row, location in enumerate(self.locations):
+            for address in location_byte_addresses(location):
+                self._rows_by_address.setdefault(address, []).append(row)
+        #: Copy of each ID set and its sorted array, by cache name
+        self._sorted_ids: dict[str, tuple[frozenset[int], object]] = {}
+        if np is not None:
+            columns = np.array(self.rows, dtype=np.int64).reshape(-1, 8).T
+            self._rows = np.arange(len(self.rows), dtype=np.int64)
+            self._ids = np.array([location.id for location in self.locations], dtype=np.int64)
+            self._index = columns[0]
+            self._nb_bytes = columns[1]
+            self._max_nb_bytes = int(columns[1].max(initial=1))
+            self._shift = columns[2]
+            self._mask = columns[3]
+            self._threshold = columns[4]
+            self._map_index = np.maximum(columns[5], 0)
+            self._map_nb_bytes = columns[6]
+            self._map_value = columns[7]
+            self._has_map = columns[5] >= 0
+            self._max_map_nb_bytes = int(columns[6].max(initial=0))
+
+    def candidate_rows(self, changed_addresses: Iterable[int]) -> list[int]:
+        """
+        Return the rows reading any of the changed addresses.
+
+        :param changed_addresses: Addresses of the changed bytes
+        :return: Sorted row indexes
+        """
+        return sorted({row for address in changed_addresses for row in self._rows_by_address.get(address, ())})
+
+    def evaluate(
+        self,
+        buffer: bytes | bytearray,
+        server_locations: set[int],
+        locations_checked: set[int],
+        rows: list[int] | None = None,
+    ) -> list[SFALocationData]:
+        """
+        Return the locations newly satisfied in the snapshot.
+
+        :param buffer: Shadow memory snapshot
+        :param server_locations: Location IDs existing on the server
+        :param locations_checked: Location IDs already checked
+        :param rows: Rows to evaluate, all rows if None
+        :return: Satisfied locations that exist on the server and are not checked yet
+        """
+        if rows is not None and not rows:
+            return []
+        if self.vectorized:
+            return self._evaluate_vectorized(buffer, server_locations, locations_checked, rows)
+        return self._evaluate_rows(buffer, server_locations, locations_checked, rows)
+
+    def _evaluate_rows(
+        self,
+        buffer: bytes | bytearray,
+        server_locations: set[int],
+        locations_checked: set[int],
+        rows: list[int] | None,
+    ) -> list[SFALocationData]:
+        """Pure Python evaluation, see evaluate()."""
+        satisfied = []
+        for row in range(len(self.rows)) if rows is None else rows:
+            location = self.locations[row]
+            if location.id not in server_locations or location.id in locations_checked:
+                continue
+            index, nb_bytes, shift, mask, threshold, map_index, map_nb_bytes, map_value = self.rows[row]
+            value = buffer[index] if nb_bytes == 1 else int.from_bytes(buffer[index : index + nb_bytes], "little")
+            if ((value >> shift) & mask) < threshold:
+                continue
+            if map_index >= 0 and int.from_bytes(buffer[map_index : map_index + map_nb_bytes], "little") != map_value:
+                continue
+            satisfied.append(location)
+        return satisfied
+
+    def _evaluate_vectorized(
+        self,
+        buffer: bytes | bytearray,
+        server_locations: set[int],
+        locations_checked: set[int],
+        rows: list[int] | None,
+    ) -> list[SFALocationData]:
+        """NumPy evaluation, see evaluate()."""
+        data = np.frombuffer(buffer, dtype=np.uint8).astype(np.int64)
+        select = slice(None) if rows is None else np.array(rows, dtype=np.int64)
+        value = self._gather(data, self._index[select], self._nb_bytes[select], self._max_nb_bytes)
+        satisfied = ((value >> self._shift[select]) & self._mask[select]) >= self._threshold[select]
+        if self._has_map.any():
+            map_index = self._map_index[select]
+            map_value = self._gather(data, map_index, self._map_nb_bytes[select], self._max_map_nb_bytes)
+            satisfied &= ~self._has_map[select] | (map_value == self._map_value[select])
+        selected_rows = self._rows[select][satisfied]
+        if selected_rows.size:
+            ids = self._ids[selected_rows]
+            new = self._isin(ids, "server", server_locations) & ~self._isin(ids, "checked", locations_checked)
+            selected_rows = selected_rows[new]
+        return [self.locations[row] for row in selected_rows.tolist()]
+
+    @staticmethod
+    def _gather(data, index, nb_bytes, max_nb_bytes: int):
+        """
+        Read little endian values of various sizes from the snapshot.
+
+        :param data: Snapshot bytes as an int64 array
+        :param index: Array of value byte indexes
+        :param nb_bytes: Array of value numbers of bytes
+        :param max_nb_bytes: Largest number of bytes of a value
+        :return: Array of values
+        """
+        value = data[index]
+        for byte in range(1, max_nb_bytes):
+            in_value = byte < nb_bytes
+            value |= np.where(in_value, data[np.where(in_value, index + byte, 0)], 0) << (8 * byte)
+        return value
+
+    def _isin(self, ids, name: str, id_set: set[int]):
+        """
+        Test membership of IDs in a set through a cached sorted array.
+
+        :param ids: Array of IDs to test
+        :param name: Cache name of the set
+        :param id_set: Set of IDs, the sorted array is rebuilt whenever its content differs from the cached copy
+        :return: Boolean array
+        """
+        cached_set, sorted_ids = self._sorted_ids.get(name, (None, None))
+        if cached_set != id_set:
+            cached_set = frozenset(id_set)
+            sorted_ids = np.array(sorted(cached_set), dtype=np.int64)
+            self._sorted_ids[name] = (cached_set, sorted_ids)
+        if not sorted_ids.size:
+            return np.zeros(ids.shape, dtype=bool)
+        positions = np.minimum(np.searchsorted(sorted_ids, ids), sorted_ids.size - 1)
+        return sorted_ids[positions] == ids
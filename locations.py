@@ -2,6 +2,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from enum import Enum, auto
+from types import MappingProxyType
 from typing import TYPE_CHECKING
 
 from BaseClasses import ItemClassification, Location
@@ -43,6 +44,17 @@ class SFALocationData:
     type: SFALocationType
     region: SFARegion
 
+    @classmethod
+    def get_by_id(cls, id: int) -> SFALocationData | None:
+        """
+        Return location for given id.
+
+        :param cls: SFALocationData class
+        :param id: Location id to search
+        :return: SFALocationData for given id
+        """
+        return LOCATIONS_BY_ID.get(id)
+
 
 @dataclass
 class SFAUpgradeLocationData(SFALocationData):
@@ -79,6 +91,38 @@ class SFACountLocationData(SFALocationData):
     bit_size: int
 
 
+def location_byte_addresses(location: SFALocationData) -> list[int]:
+    """
+    List the memory bytes read to check a location.
+
+    :param location: Location data
+    :return: Byte addresses
+    """
+    bit_size = location.bit_size if isinstance(location, SFACountLocationData) else 1
+    start = location.table_address + location.bit_offset // 8
+    end = location.table_address + (location.bit_offset + bit_size - 1) // 8
+    addresses = list(range(start, end + 1))
+    if isinstance(location, SFALinkedLocationData):
+        addresses.extend(range(location.map_address, location.map_address + location.map_bit_size))
+    return addresses
+
+
+def _index_linked_locations(
+    locations: list[SFAUpgradeLocationData | SFAShopLocationData],
+) -> dict[int, tuple[SFALocationData, ...]]:
+    """
+    Index locations by the item sharing their flag.
+
+    :param locations: Upgrade and shop locations
+    :return: Locations by linked item ID
+    """
+    index: dict[int, tuple[SFALocationData, ...]] = {}
+    for location in locations:
+        if location.type != SFALocationType.MAP:
+            index[location.linked_item] = (*index.get(location.linked_item, ()), location)
+    return index
+
+
 def locations_name_to_id_dict() -> dict[str, int]:
     """Name to id dict for Star Fox Adventures locations."""
     return {name: data.id for name, data in LOCATION_TABLE.items()}
@@ -87,7 +131,7 @@ def locations_name_to_id_dict() -> dict[str, int]:
 def create_regular_locations(world: SFAWorld) -> None:
     """Create locations for AP world."""
     for loc_name, loc_data in LOCATION_TABLE.items():
-        if world.options.shop_locations == "nothing" and loc_data in LOCATION_SHOP.values():
+        if world.options.shop_locations == "nothing" and loc_name in LOCATION_SHOP:
             continue
         if world.options.shop_locations == "no_map" and loc_data.type == SFALocationType.MAP:
             continue
@@ -362,3 +406,13 @@ LOCATION_TABLE: dict[str, SFALocationData] = {
     **LOCATION_FUEL_CELL,
     **LOCATION_DIG_SPOT,
 }
+
+#: Location data by location ID
+LOCATIONS_BY_ID: MappingProxyType[int, SFALocationData] = MappingProxyType(
+    {location.id: location for location in LOCATION_TABLE.values()}
+)
+
+#: Upgrade and shop locations by the item ID sharing their flag
+LINKED_LOCATIONS_BY_ITEM: MappingProxyType[int, tuple[SFALocationData, ...]] = MappingProxyType(
+    _index_linked_locations([*LOCATION_UPGRADE.values(), *LOCATION_SHOP.values()])
+)
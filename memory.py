@@ -0,0 +1,278 @@
+from collections.abc import Iterable
+
+from .backends import DmeBackend, MemoryBackend
+
+#: Regions closer than this many bytes are read together in a single call
+MAX_SPAN_GAP = 0x1000
+#: Dirty spans closer than this many bytes are checked with a single read on commit
+COMMIT_READ_GAP = 0x100
+
+
+def merge_regions(regions: Iterable[tuple[int, int]], max_gap: int = MAX_SPAN_GAP) -> list[tuple[int, int]]:
+    """
+    Merge memory regions into larger spans to read them in fewer calls.
+
+    :param regions: Iterable of (address, size) regions
+    :param max_gap: Maximum number of bytes between two regions to merge them
+    :return: Sorted list of (address, size) spans
+    """
+    spans: list[list[int]] = []
+    for address, size in sorted(regions):
+        if spans and address <= spans[-1][0] + spans[-1][1] + max_gap:
+            spans[-1][1] = max(spans[-1][1], address + size - spans[-1][0])
+        else:
+            spans.append([address, size])
+    return [(address, size) for address, size in spans]
+
+
+class ShadowMemory:
+    """
+    Local copy of the watched memory spans, refreshed once per tick.
+
+    Reads fully inside a watched span are served from the snapshot, anything else goes to the backend.
+    Writes always go to the backend and are mirrored into the snapshot.
+    Between begin() and commit(), bit updates are merged per byte and written once per contiguous dirty span.
+    """
+
+    def __init__(self, backend: MemoryBackend, regions: Iterable[tuple[int, int]] = ()):
+        """
+        Initialize the shadow memory.
+
+        :param backend: Memory backend to read from and write to
+        :param regions: Iterable of (address, size) regions to watch
+        """
+        self.backend = backend
+        self.spans: list[tuple[int, int]] = []
+        self.buffer = bytearray()
+        self.valid = False
+        self.buffering = False
+        #: Snapshot content when changes were last collected
+        self.baseline: bytes | None = None
+        self._bases: list[int] = []
+        #: Pending byte updates, address -> [and_mask, or_mask]
+        self._pending: dict[int, list[int]] = {}
+        self.watch(regions)
+
+    def watch(self, regions: Iterable[tuple[int, int]]) -> None:
+        """
+        Replace the watched regions.
+
+        :param regions: Iterable of (address, size) regions to watch
+        """
+        self.spans = merge_regions(regions)
+        self._bases = []
+        position = 0
+        for _, size in self.spans:
+            self._bases.append(position)
+            position += size
+        self.buffer = bytearray(position)
+        self.valid = False
+        self.baseline = None
+
+    def refresh(self) -> bool:
+        """
+        Read all watched spans from the backend.
+
+        :return: True if any watched byte changed since the previous refresh, or the snapshot was not valid
+        """
+        changed = not self.valid
+        for (_, size), base, data in zip(self.spans, self._bases, self.backend.read_spans(self.spans), strict=True):
+            if changed or self.buffer[base : base + size] != data:
+                changed = True
+                self.buffer[base : base + size] = data
+        self.valid = True
+        return changed
+
+    def invalidate(self) -> None:
+        """Drop the snapshot and pending writes, reads go to the backend until the next refresh."""
+        self.valid = False
+        self.baseline = None
+        self.discard()
+
+    def changed_addresses(self) -> list[int] | None:
+        """
+        Return the addresses whose byte changed since the previous call, and take the snapshot as new baseline.
+
+        :return: Changed addresses, None if there is no baseline to compare with
+        """
+        if not self.valid:
+            return None
+        baseline = self.baseline
+        self.baseline = bytes(self.buffer)
+        if baseline is None:
+            return None
+        diff = int.from_bytes(self.buffer) ^ int.from_bytes(baseline)
+        if not diff:
+            return []
+        changed = []
+        diff_bytes = diff.to_bytes(len(self.buffer))
+        for (address, size), base in zip(self.spans, self._bases, strict=True):
+            changed.extend(address + i for i in range(size) if diff_bytes[base + i])
+        return changed
+
+    def snapshot(self) -> bytes | bytearray:
+        """
+        Return the snapshot buffer with pending bit updates applied.
+
+        :return: Snapshot of all watched spans, in span order
+        """
+        if not self._pending:
+            return self.buffer
+        snapshot = bytearray(self.buffer)
+        for (address, size), base in zip(self.spans, self._bases, strict=True):
+            snapshot[base : base + size] = self._apply_pending(address, self.buffer[base : base + size])
+        return snapshot
+
+    def locate(self, address: int, nb_bytes: int = 1) -> int | None:
+        """
+        Return the snapshot index of an address.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes that must be inside the same span
+        :return: Index in the snapshot buffer, None if not watched
+        """
+        for (start, size), base in zip(self.spans, self._bases, strict=True):
+            if start <= address and address + nb_bytes <= start + size:
+                return base + address - start
+        return None
+
+    def read_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read bytes from the snapshot, or from the backend if not watched.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        data = None
+        if self.valid:
+            index = self.locate(address, nb_bytes)
+            if index is not None:
+                data = bytes(self.buffer[index : index + nb_bytes])
+        if data is None:
+            data = self.backend.read_bytes(address, nb_bytes)
+        if self._pending:
+            data = self._apply_pending(address, data)
+        return data
+
+    def read_byte(self, address: int) -> int:
+        """
+        Read a single byte from the snapshot, or from the backend if not watched.
+
+        :param address: Byte address
+        :return: Byte value
+        """
+        index = self.locate(address) if self.valid else None
+        byte = self.buffer[index] if index is not None else self.backend.read_byte(address)
+        pending = self._pending.get(address)
+        if pending is not None:
+            byte = (byte & pending[0]) | pending[1]
+        return byte
+
+    def write_bytes(self, address: int, data: bytes) -> None:
+        """
+        Write bytes to the backend and mirror them in the snapshot.
+
+        :param address: Start address
+        :param data: Bytes to write
+        """
+        self.backend.write_bytes(address, data)
+        self._mirror(address, data)
+
+    def _mirror(self, address: int, data: bytes) -> None:
+        """
+        Copy written bytes into the snapshot.
+
+        :param address: Start address
+        :param data: Bytes written
+        """
+        index = self.locate(address, len(data))
+        if index is not None:
+            self.buffer[index : index + len(data)] = data
+
+    def update_bits(self, address: int, and_mask: int, or_mask: int) -> None:
+        """
+        Update bits of a single byte as (byte & and_mask) | or_mask.
+
+        :param address: Byte address
+        :param and_mask: Mask of bits to keep
+        :param or_mask: Mask of bits to set
+        """
+        if not self.buffering:
+            # Modify live memory, the snapshot can be outdated by the game
+            byte = self.backend.read_byte(address)
+            updated_byte = (byte & and_mask) | or_mask
+            if updated_byte != byte:
+                self.write_bytes(address, bytes([updated_byte]))
+            return
+        pending = self._pending.get(address)
+        if pending is None:
+            self._pending[address] = [and_mask, or_mask]
+        else:
+            pending[0] &= and_mask
+            pending[1] = (pending[1] & and_mask) | or_mask
+
+    def begin(self) -> None:
+        """Start holding bit updates until commit()."""
+        self.buffering = True
+
+    def discard(self) -> None:
+        """Drop pending bit updates and stop holding them."""
+        self._pending.clear()
+        self.buffering = False
+
+    def commit(self) -> int:
+        """
+        Write pending bit updates with one read and at most one write per contiguous dirty span.
+
+        :return: Number of spans written
+        """
+        pending = self._pending
+        self._pending = {}
+        self.buffering = False
+        if not pending:
+            return 0
+        runs: list[tuple[int, int]] = []
+        for address in sorted(pending):
+            if runs and address == runs[-1][0] + runs[-1][1]:
+                runs[-1] = (runs[-1][0], runs[-1][1] + 1)
+            else:
+                runs.append((address, 1))
+        # Dirty spans close to each other share a single read
+        read_spans = merge_regions(runs, COMMIT_READ_GAP)
+        writes: list[tuple[int, bytes]] = []
+        run_index = 0
+        for (read_address, read_size), current in zip(read_spans, self.backend.read_spans(read_spans), strict=True):
+            while run_index < len(runs) and runs[run_index][0] < read_address + read_size:
+                address, size = runs[run_index]
+                before = bytes(current[address - read_address : address - read_address + size])
+                after = bytes(
+                    (byte & pending[address + i][0]) | pending[address + i][1] for i, byte in enumerate(before)
+                )
+                if after != before:
+                    writes.append((address, after))
+                run_index += 1
+        if writes:
+            self.backend.write_spans(writes)
+            for address, data in writes:
+                self._mirror(address, data)
+        return len(writes)
+
+    def _apply_pending(self, address: int, data: bytes) -> bytes:
+        """
+        Apply pending bit updates on bytes read from memory.
+
+        :param address: Start address of the data
+        :param data: Bytes read from memory
+        :return: Bytes as they will be after commit
+        """
+        updated = bytearray(data)
+        for i in range(len(updated)):
+            pending = self._pending.get(address + i)
+            if pending is not None:
+                updated[i] = (updated[i] & pending[0]) | pending[1]
+        return bytes(updated)
+
+
+#: Shared shadow memory used by the bit helpers
+SHADOW = ShadowMemory(DmeBackend())
@@ -0,0 +1,83 @@
+import asyncio
+import itertools
+import queue
+import threading
+from collections.abc import Callable
+from typing import Any
+
+#: Job priorities, lower values are served first
+PRIORITY_DELIVERY = 0
+PRIORITY_LOCATIONS = 1
+PRIORITY_FLAGS = 2
+
+
+def _set_result(future: asyncio.Future, result: Any) -> None:
+    """Set a future result unless it was cancelled."""
+    if not future.cancelled():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exception: BaseException) -> None:
+    """Set a future exception unless it was cancelled."""
+    if not future.cancelled():
+        future.set_exception(exception)
+
+
+class MemoryWorker:
+    """
+    Thread owning all access to the emulator memory.
+
+    Jobs are served one at a time by priority, so blocking emulator calls never stall the asyncio loop and
+    read-modify-writes from different tasks never interleave.
+    """
+
+    def __init__(self):
+        """Initialize the worker, call start() to run it."""
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="SFAMemoryWorker", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the worker thread once queued jobs are done."""
+        if self._thread is not None:
+            self._queue.put((float("inf"), next(self._counter), None, (), None, None))
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, priority: int, function: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """
+        Queue a job on the worker.
+
+        :param priority: Job priority, lower values are served first
+        :param function: Function to run on the worker thread
+        :param args: Arguments of the function
+        :return: Future resolved with the function result on the calling event loop
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.put((priority, next(self._counter), function, args, loop, future))
+        return future
+
+    def _run(self) -> None:
+        """Serve jobs until stopped."""
+        while True:
+            _, _, function, args, loop, future = self._queue.get()
+            if function is None:
+                return
+            try:
+                result = function(*args)
+            except BaseException as exception:
+                callback, value = _set_exception, exception
+            else:
+                callback, value = _set_result, result
+            try:
+                loop.call_soon_threadsafe(callback, future, value)
+            except RuntimeError:
+                # Event loop already closed
+                pass
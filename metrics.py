@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import Callable
+
+from .perf import RollingStats, nearest_rank
+
+logger = logging.getLogger("Client")
+
+#: Seconds between two metric exports
+EXPORT_INTERVAL = 10.0
+#: Size of a JSON-lines metrics file before it is rotated
+MAX_JSONL_BYTES = 16 * 1024 * 1024
+#: Quantiles exported for rolling statistics
+QUANTILES = (0.5, 0.95, 0.99)
+#: Supported export formats
+METRICS_FORMATS = ("prometheus", "jsonl")
+
+
+def _label_text(labels: dict[str, str]) -> str:
+    """
+    Format labels the Prometheus way.
+
+    :param labels: Label values by name
+    :return: Labels between braces, empty without labels
+    """
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels.items()) + "}"
+
+
+class MetricsSnapshot:
+    """
+    Metric values at a given time.
+
+    Rolling statistics are copied when added, their quantiles are only computed when the snapshot is formatted.
+    """
+
+    def __init__(self):
+        """Initialize an empty snapshot taken now."""
+        self.time = time.time()
+        #: Type and help of each metric name
+        self.metadata: dict[str, tuple[str, str]] = {}
+        self._values: list[tuple[str, dict[str, str], float]] = []
+        self._stats: list[tuple[str, dict[str, str], list[float], int, float]] = []
+
+    def add(self, name: str, value: float, kind: str, description: str, **labels: str) -> None:
+        """
+        Add a value.
+
+        :param name: Metric name
+        :param value: Metric value
+        :param kind: Prometheus type, gauge or counter
+        :param description: Help of the metric
+        :param labels: Label values by name
+        """
+        self.metadata.setdefault(name, (kind, description))
+        self._values.append((name, labels, value))
+
+    def add_stats(self, name: str, stats: RollingStats, description: str, **labels: str) -> None:
+        """
+        Add rolling statistics, as a Prometheus summary.
+
+        :param name: Metric name
+        :param stats: Statistics to copy
+        :param description: Help of the metric
+        :param labels: Label values by name
+        """
+        self.metadata.setdefault(name, ("summary", description))
+        self._stats.append((name, labels, list(stats.samples), stats.count, stats.total))
+
+    def values(self) -> list[tuple[str, dict[str, str], float]]:
+        """
+        Return all values, with summaries expanded into quantiles, sum and count.
+
+        :return: List of (name, labels, value)
+        """
+        values = list(self._values)
+        for name, labels, samples, count, total in self._stats:
+            samples.sort()
+            if samples:
+                for quantile in QUANTILES:
+                    values.append((name, {**labels, "quantile": str(quantile)}, nearest_rank(samples, quantile * 100)))
+            values.append((f"{name}_sum", labels, total))
+            values.append((f"{name}_count", labels, count))
+        return values
+
+    def to_prometheus(self) -> str:
+        """
+        Format the snapshot in the Prometheus text format.
+
+        :return: Text with HELP and TYPE lines before the values of each metric
+        """
+        families: dict[str, list[str]] = {}
+        for name, labels, value in self.values():
+            family = name if name in self.metadata else name.removesuffix("_sum").removesuffix("_count")
+            families.setdefault(family, []).append(f"{name}{_label_text(labels)} {value}")
+        lines = []
+        for family, samples in families.items():
+            kind, description = self.metadata[family]
+            lines.append(f"# HELP {family} {description}")
+            lines.append(f"# TYPE {family} {kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        """
+        Format the snapshot as a single JSON line.
+
+        :return: JSON object with the time and the values by name and labels
+        """
+        values = {f"{name}{_label_text(labels)}": value for name, labels, value in self.values()}
+        return json.dumps({"time": self.time, "metrics": values}, separators=(",", ":"))
+
+
+class MetricsExporter:
+    """
+    Export metric snapshots to a file at a fixed interval, the file is written on a separate thread.
+
+    Prometheus textfiles are replaced atomically, JSON-lines files get one line per snapshot and are rotated once
+    they reach MAX_JSONL_BYTES, keeping a single previous file.
+    """
+
+    def __init__(self, path: str, format_name: str, interval: float = EXPORT_INTERVAL):
+        """
+        Initialize the exporter.
+
+        :param path: File to write
+        :param format_name: prometheus or jsonl
+        :param interval: Seconds between two exports
+        """
+        if format_name not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format {format_name}")
+        self.path = path
+        self.format_name = format_name
+        self.interval = interval
+
+    def write(self, snapshot: MetricsSnapshot) -> None:
+        """
+        Write a snapshot to the file.
+
+        :param snapshot: Metric values to write
+        """
+        if self.format_name == "prometheus":
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8") as file:
+                file.write(snapshot.to_prometheus())
+            os.replace(temp_path, self.path)
+            return
+        try:
+            if os.path.getsize(self.path) >= MAX_JSONL_BYTES:
+                os.replace(self.path, self.path + ".1")
+        except FileNotFoundError:
+            pass
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(snapshot.to_json() + "\n")
+
+    async def run(self, collect: Callable[[], MetricsSnapshot]) -> None:
+        """
+        Export snapshots until cancelled.
+
+        :param collect: Function taking a snapshot, called on the event loop
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await asyncio.to_thread(self.write, collect())
+            except OSError as error:
+                logger.error(f"Failed to export metrics: {error}")
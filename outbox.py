@@ -0,0 +1,136 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Any
+
+logger = logging.getLogger("Client")
+
+#: Seconds messages are gathered before being sent together
+FLUSH_WINDOW = 0.05
+
+
+class Outbox:
+    """
+    Messages to the server, coalesced and sent by a dedicated task so the game watcher never awaits the network.
+
+    Within a flush window, location checks are merged into one LocationChecks, only the latest value of each
+    DataStorage key and the latest client status are sent, and scouted locations are deduplicated. Everything is sent
+    as a single packet.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[list[dict[str, Any]]], Awaitable[bool]],
+        flush_window: float = FLUSH_WINDOW,
+        on_sent: Callable[[list[dict[str, Any]]], None] | None = None,
+    ):
+        """
+        Initialize the outbox, run() sends the messages.
+
+        :param send: Coroutine function sending a list of messages to the server, returning whether they were written
+        :param flush_window: Seconds messages are gathered before being sent together
+        :param on_sent: Function called with the messages once they are written
+        """
+        self.send = send
+        self.flush_window = flush_window
+        self.on_sent = on_sent
+        self._checks: set[int] = set()
+        #: Latest Set message by DataStorage key
+        self._sets: dict[str, dict[str, Any]] = {}
+        #: Latest client status to send, None if unchanged
+        self._status: int | None = None
+        #: Locations to scout by create_as_hint value
+        self._scouts: dict[int, set[int]] = {}
+        self._messages: list[dict[str, Any]] = []
+        self._event = asyncio.Event()
+
+    def check_locations(self, locations: Iterable[int]) -> None:
+        """
+        Queue location checks.
+
+        :param locations: IDs of the checked locations
+        """
+        self._checks.update(locations)
+        self._event.set()
+
+    def set_value(self, key: str, value: Any, default: Any = None) -> None:
+        """
+        Queue a DataStorage Set replacing the value of a key, dropping any pending Set of the same key.
+
+        :param key: DataStorage key
+        :param value: New value
+        :param default: Value used by the server if the key does not exist
+        """
+        self._sets[key] = {
+            "cmd": "Set",
+            "key": key,
+            "default": default,
+            "operations": [{"operation": "replace", "value": value}],
+        }
+        self._event.set()
+
+    def update_status(self, status: int) -> None:
+        """
+        Queue a StatusUpdate, replacing any pending one.
+
+        :param status: New client status
+        """
+        self._status = status
+        self._event.set()
+
+    def scout_locations(self, locations: Iterable[int], create_as_hint: int = 0) -> None:
+        """
+        Queue location scouts.
+
+        :param locations: IDs of the locations to scout
+        :param create_as_hint: Hint creation mode of the LocationScouts
+        """
+        self._scouts.setdefault(create_as_hint, set()).update(locations)
+        self._event.set()
+
+    def send_message(self, message: dict[str, Any]) -> None:
+        """
+        Queue any other message, sent after the coalesced ones in queue order.
+
+        :param message: Message to send
+        """
+        self._messages.append(message)
+        self._event.set()
+
+    def take(self) -> list[dict[str, Any]]:
+        """
+        Remove the pending messages from the queue.
+
+        :return: Coalesced messages, location checks first
+        """
+        messages: list[dict[str, Any]] = []
+        if self._checks:
+            messages.append({"cmd": "LocationChecks", "locations": sorted(self._checks)})
+        messages.extend(self._sets.values())
+        if self._status is not None:
+            messages.append({"cmd": "StatusUpdate", "status": self._status})
+        for create_as_hint, locations in self._scouts.items():
+            messages.append({"cmd": "LocationScouts", "locations": sorted(locations), "create_as_hint": create_as_hint})
+        messages.extend(self._messages)
+        self._checks = set()
+        self._sets = {}
+        self._status = None
+        self._scouts = {}
+        self._messages = []
+        self._event.clear()
+        return messages
+
+    async def run(self) -> None:
+        """Send the queued messages once per flush window, until cancelled."""
+        while True:
+            await self._event.wait()
+            await asyncio.sleep(self.flush_window)
+            messages = self.take()
+            try:
+                sent = await self.send(messages)
+            except Exception as exception:
+                logger.debug(f"Failed to send {len(messages)} messages: {exception}")
+                continue
+            # Messages dropped while disconnected are not retried, the game watcher queues checks and status again
+            if sent and self.on_sent is not None:
+                self.on_sent(messages)
@@ -0,0 +1,114 @@
+import math
+from collections import deque
+
+#: Samples kept for the percentiles of rolling statistics
+HISTORY = 1000
+
+
+def nearest_rank(samples: list[float], rank: float) -> float:
+    """
+    Return a percentile with the nearest-rank method.
+
+    :param samples: Sorted samples, not empty
+    :param rank: Percentile rank, between 0 and 100
+    :return: Sample value
+    """
+    return samples[max(0, min(len(samples), math.ceil(rank / 100 * len(samples))) - 1)]
+
+
+class RollingStats:
+    """Statistics of a measured value, percentiles are computed over the last samples only."""
+
+    def __init__(self, history: int = HISTORY):
+        """
+        Initialize the statistics without samples.
+
+        :param history: Number of samples kept for the percentiles
+        """
+        self.samples: deque[float] = deque(maxlen=history)
+        self.count = 0
+        #: Sum of all samples
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value: float) -> None:
+        """
+        Add a sample.
+
+        :param value: Sample value
+        """
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    def percentile(self, rank: float) -> float:
+        """
+        Return a percentile of the kept samples, with the nearest-rank method.
+
+        :param rank: Percentile rank, between 0 and 100
+        :return: Sample value, 0 without samples
+        """
+        if not self.samples:
+            return 0.0
+        return nearest_rank(sorted(self.samples), rank)
+
+    def summary(self, scale: float = 1000.0, unit: str = "ms", digits: int = 2) -> str:
+        """
+        Describe the statistics.
+
+        :param scale: Factor applied to the values
+        :param unit: Unit of the scaled values
+        :param digits: Number of decimals of the scaled values
+        :return: Count, p50, p95, p99 and maximum
+        """
+        if not self.samples:
+            return "no samples"
+        samples = sorted(self.samples)
+        values = [nearest_rank(samples, rank) for rank in (50, 95, 99)] + [self.maximum]
+        p50, p95, p99, maximum = (f"{value * scale:.{digits}f} {unit}" for value in values)
+        return f"{self.count} samples, p50 {p50}, p95 {p95}, p99 {p99}, max {maximum}"
+
+
+class PerfStats:
+    """Rolling statistics by name, created on first use."""
+
+    def __init__(self, history: int = HISTORY):
+        """
+        Initialize without statistics.
+
+        :param history: Number of samples kept for the percentiles of each statistic
+        """
+        self.history = history
+        self.stats: dict[str, RollingStats] = {}
+
+    def get(self, name: str) -> RollingStats:
+        """
+        Return the statistics of a name.
+
+        :param name: Name of the measured value
+        :return: Statistics, created if needed
+        """
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = RollingStats(self.history)
+        return stats
+
+    def add(self, name: str, value: float) -> None:
+        """
+        Add a sample to the statistics of a name.
+
+        :param name: Name of the measured value
+        :param value: Sample value
+        """
+        self.get(name).add(value)
+
+    def count(self, *names: str) -> int:
+        """
+        Return the total number of samples of some names.
+
+        :param names: Names of the measured values
+        :return: Number of samples
+        """
+        return sum(self.stats[name].count for name in names if name in self.stats)
@@ -0,0 +1,125 @@
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from .perf import RollingStats
+
+#: Consecutive unchanged refreshes before periods are doubled
+IDLE_TICKS = 20
+#: Maximum factor applied to periods while idle
+MAX_BACKOFF = 8
+
+
+@dataclass
+class ScheduledTask:
+    """Subsystem run by the tick scheduler at its own rate."""
+
+    name: str
+    run: Callable[[], Awaitable[None]]
+    #: Seconds between runs while the game is active
+    period: float
+    #: Seconds a run may take before it is counted as an overrun
+    budget: float
+    next_run: float = 0.0
+    runs: int = 0
+    overruns: int = 0
+    #: Seconds taken by the last runs
+    durations: RollingStats = field(default_factory=RollingStats)
+
+
+class TickScheduler:
+    """
+    Run tasks at their own rate, backing off while the watched memory does not change.
+
+    Periods are doubled every IDLE_TICKS unchanged refreshes, up to MAX_BACKOFF, and reset on the first change.
+    """
+
+    def __init__(self, tasks: list[ScheduledTask], idle_ticks: int = IDLE_TICKS, max_backoff: int = MAX_BACKOFF):
+        """
+        Initialize the scheduler, every task is due at once.
+
+        :param tasks: Tasks in the order they run within a tick
+        :param idle_ticks: Consecutive unchanged refreshes before periods are doubled
+        :param max_backoff: Maximum factor applied to periods while idle
+        """
+        self.tasks = tasks
+        self.idle_ticks = idle_ticks
+        self.max_backoff = max_backoff
+        self.backoff = 1
+        self._unchanged = 0
+
+    def due(self, now: float) -> list[ScheduledTask]:
+        """
+        Return the tasks due at a given time.
+
+        :param now: Current loop time
+        :return: Due tasks, in run order
+        """
+        return [task for task in self.tasks if task.next_run <= now]
+
+    def delay(self, now: float) -> float:
+        """
+        Return the time until the next task is due.
+
+        :param now: Current loop time
+        :return: Delay in seconds
+        """
+        return max(0.0, min(task.next_run for task in self.tasks) - now)
+
+    def record_refresh(self, changed: bool) -> bool:
+        """
+        Update the idle backoff after a memory refresh.
+
+        :param changed: Watched memory changed since the previous refresh
+        :return: True if the scheduler left the idle backoff and every task is due again
+        """
+        if changed:
+            self._unchanged = 0
+            if self.backoff > 1:
+                self.wake()
+                return True
+            return False
+        self._unchanged += 1
+        if self._unchanged >= self.idle_ticks and self.backoff < self.max_backoff:
+            self._unchanged = 0
+            self.backoff *= 2
+        return False
+
+    def trigger(self, name: str) -> None:
+        """
+        Make a task due now, without changing the others.
+
+        :param name: Name of the task
+        """
+        for task in self.tasks:
+            if task.name == name:
+                task.next_run = 0.0
+
+    def wake(self) -> None:
+        """Leave the idle backoff and make every task due."""
+        self.backoff = 1
+        self._unchanged = 0
+        for task in self.tasks:
+            task.next_run = 0.0
+
+    async def run(self, task: ScheduledTask, now: float, clock: Callable[[], float]) -> None:
+        """
+        Run a task and schedule its next run.
+
+        :param task: Task to run
+        :param now: Loop time of the tick
+        :param clock: Loop clock, to measure the run time
+        """
+        # Keep a fixed cadence, so tasks with multiple periods share the same ticks
+        interval = task.period * self.backoff
+        task.next_run += interval
+        if task.next_run <= now:
+            task.next_run = now + interval
+        start = clock()
+        try:
+            await task.run()
+        finally:
+            duration = clock() - start
+            task.runs += 1
+            task.durations.add(duration)
+            if duration > task.budget:
+                task.overruns += 1
@@ -0,0 +1,187 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from ..backends import GAME_ID, IOV_MAX, MEM1_ADDRESS, MEM1_SIZE, ProcessVmBackend, ShmBackend
+from ..memory import SHADOW
+from ..SFAClient import _hook_dolphin
+
+#: Child process holding a fake MEM1 in a ctypes buffer. It prints the buffer address, then answers each
+#: "<index> <size>" line on stdin with the hex content of the buffer at that index.
+FAKE_DOLPHIN = f"""
+import ctypes
+import sys
+
+ram = ctypes.create_string_buffer({MEM1_SIZE})
+ram[: {len(GAME_ID)}] = {GAME_ID!r}
+ram[0x100 : 0x200] = bytes(range(0x100))
+print(ctypes.addressof(ram), flush=True)
+for line in sys.stdin:
+    index, size = (int(value) for value in line.split())
+    print(ram[index : index + size].hex(), flush=True)
+"""
+
+
+@unittest.skipUnless(sys.platform == "linux", "process_vm_readv is only available on Linux")
+class TestProcessVmBackend(unittest.TestCase):
+    """Vectored reads and writes against a child process holding a fake RAM buffer."""
+
+    def setUp(self) -> None:
+        self.child = subprocess.Popen(
+            [sys.executable, "-c", FAKE_DOLPHIN], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        ram_base = int(self.child.stdout.readline())
+        self.backend = ProcessVmBackend(self.child.pid, ram_base)
+        self.backend.hook()
+
+    def tearDown(self) -> None:
+        self.backend.un_hook()
+        self.child.kill()
+        self.child.wait()
+        self.child.stdin.close()
+        self.child.stdout.close()
+
+    def child_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read the fake RAM from inside the child process.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        self.child.stdin.write(f"{address - MEM1_ADDRESS} {nb_bytes}\n")
+        self.child.stdin.flush()
+        return bytes.fromhex(self.child.stdout.readline())
+
+    def test_read(self) -> None:
+        self.assertTrue(self.backend.is_hooked())
+        self.assertEqual(self.backend.read_bytes(MEM1_ADDRESS, len(GAME_ID)), GAME_ID)
+        self.assertEqual(self.backend.read_byte(MEM1_ADDRESS + 0x1A5), 0xA5)
+
+    def test_read_spans(self) -> None:
+        # More spans than a single system call takes
+        spans = [(MEM1_ADDRESS + 0x100 + index % 0x80, 1 + index % 0x80) for index in range(IOV_MAX + 10)]
+        expected = [bytes(range(address - MEM1_ADDRESS - 0x100, 0x100))[:size] for address, size in spans]
+        self.assertEqual(self.backend.read_spans(spans), expected)
+
+    def test_write_spans(self) -> None:
+        spans = [
+            (MEM1_ADDRESS + 0x1000 + 0x10 * index, bytes([index & 0xFF]) * (1 + index % 0x10))
+            for index in range(IOV_MAX + 10)
+        ]
+        self.backend.write_spans(spans)
+        for address, data in spans[:: IOV_MAX // 4]:
+            self.assertEqual(self.child_bytes(address, len(data)), data)
+        self.backend.write_bytes(MEM1_ADDRESS + MEM1_SIZE - 2, b"\x12\x34")
+        self.assertEqual(self.child_bytes(MEM1_ADDRESS + MEM1_SIZE - 2, 2), b"\x12\x34")
+
+    def test_outside_mem1(self) -> None:
+        with self.assertRaises(RuntimeError):
+            self.backend.read_bytes(MEM1_ADDRESS + MEM1_SIZE - 1, 2)
+        with self.assertRaises(RuntimeError):
+            self.backend.write_spans([(MEM1_ADDRESS - 1, b"\x00")])
+
+    def test_process_exit(self) -> None:
+        self.child.kill()
+        self.child.wait()
+        self.assertFalse(self.backend.is_hooked())
+
+
+class TestShmBackend(unittest.TestCase):
+    """Mapped reads and writes against a plain file standing in for the Dolphin shared memory object."""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "mem1")
+        with open(self.path, "wb") as file:
+            file.write(GAME_ID)
+            file.seek(0x100)
+            file.write(bytes(range(0x100)))
+            file.truncate(MEM1_SIZE)
+        self.backend = ShmBackend(self.path)
+
+    def tearDown(self) -> None:
+        self.backend.un_hook()
+        self.directory.cleanup()
+
+    def file_bytes(self, address: int, nb_bytes: int) -> bytes:
+        """
+        Read the stand-in file directly.
+
+        :param address: Start address
+        :param nb_bytes: Number of bytes to read
+        :return: Bytes read
+        """
+        with open(self.path, "rb") as file:
+            file.seek(address - MEM1_ADDRESS)
+            return file.read(nb_bytes)
+
+    def test_hook(self) -> None:
+        self.assertTrue(self.backend.is_available())
+        self.assertFalse(self.backend.is_hooked())
+        self.backend.hook()
+        self.assertTrue(self.backend.is_hooked())
+        self.assertEqual(self.backend.get_status(), f"Mapped {self.path}")
+        self.assertEqual(self.backend.read_bytes(MEM1_ADDRESS, len(GAME_ID)), GAME_ID)
+        self.assertEqual(self.backend.read_byte(MEM1_ADDRESS + 0x1A5), 0xA5)
+
+    def test_hook_dolphin_header(self) -> None:
+        previous_backend = SHADOW.backend
+        SHADOW.backend = self.backend
+        try:
+            self.assertTrue(_hook_dolphin())
+            self.backend.un_hook()
+            with open(self.path, "r+b") as file:
+                file.write(b"GZLE01")
+            # Another game is running, the file is unmapped
+            self.assertFalse(_hook_dolphin())
+            self.assertFalse(self.backend.is_hooked())
+        finally:
+            SHADOW.backend = previous_backend
+
+    def test_hook_smaller_than_mem1(self) -> None:
+        os.truncate(self.path, MEM1_SIZE - 1)
+        with self.assertRaises(RuntimeError):
+            self.backend.hook()
+        self.assertFalse(self.backend.is_hooked())
+
+    def test_read_spans(self) -> None:
+        self.backend.hook()
+        spans = [(MEM1_ADDRESS + 0x100 + index, 0x10) for index in range(0, 0xF0, 0x18)]
+        views = self.backend.read_spans(spans)
+        self.assertEqual(
+            [bytes(view) for view in views], [bytes(range(index, index + 0x10)) for index in range(0, 0xF0, 0x18)]
+        )
+        # Views are over the mapping, they see later changes to the file
+        with open(self.path, "r+b") as file:
+            file.seek(0x100)
+            file.write(b"\xff")
+        self.assertEqual(views[0][0], 0xFF)
+        # Release the views so un_hook can close the mapping
+        del views
+
+    def test_write_bytes(self) -> None:
+        self.backend.hook()
+        self.backend.write_bytes(MEM1_ADDRESS + 0x1000, (0x12345678).to_bytes(4, "big"))
+        self.backend.write_bytes(MEM1_ADDRESS + MEM1_SIZE - 2, b"\xab\xcd")
+        self.assertEqual(self.file_bytes(MEM1_ADDRESS + 0x1000, 4), b"\x12\x34\x56\x78")
+        self.assertEqual(self.file_bytes(MEM1_ADDRESS + MEM1_SIZE - 2, 2), b"\xab\xcd")
+        self.assertEqual(os.path.getsize(self.path), MEM1_SIZE)
+        with self.assertRaises(RuntimeError):
+            self.backend.write_bytes(MEM1_ADDRESS + MEM1_SIZE - 1, b"\x00\x00")
+
+    def test_un_hook(self) -> None:
+        self.backend.hook()
+        self.backend.un_hook()
+        self.assertFalse(self.backend.is_hooked())
+        self.assertIsNone(self.backend.mapped_path)
+        with self.assertRaises(RuntimeError):
+            self.backend.read_bytes(MEM1_ADDRESS, 1)
+        if sys.platform == "linux":
+            with open("/proc/self/maps", encoding="utf-8") as maps:
+                self.assertNotIn(self.path, maps.read())
+        # Hooking again maps the file again
+        self.backend.hook()
+        self.assertEqual(self.backend.read_bytes(MEM1_ADDRESS, len(GAME_ID)), GAME_ID)
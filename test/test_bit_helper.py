@@ -0,0 +1,200 @@
+import random
+import unittest
+from typing import Literal
+
+from .. import bit_helper
+from ..backends import MEM1_ADDRESS, FakeBackend
+from ..memory import SHADOW
+
+#: Random inputs checked by each property
+SAMPLES = 20000
+#: Start of the game flags tables, used as base address of the memory properties
+TABLE_ADDRESS = 0x803A32CC
+
+
+def padded_string_byte(input_byte: int | bool, padding_size: int = 8) -> str:
+    """Previous string implementation of bit_helper.padded_string_byte."""
+    temp_str = str(bin(input_byte)).removeprefix("0b")
+    while len(temp_str) % padding_size != 0:
+        temp_str = "0" + temp_str
+    return temp_str
+
+
+def extract_bitflag_list(input_bytes: int) -> list[int]:
+    """Previous string implementation of bit_helper.extract_bitflag_list."""
+    string_bytes = padded_string_byte(input_bytes)
+    return [len(string_bytes) - 1 - i for i in range(len(string_bytes)) if string_bytes[i] == "1"]
+
+
+def extract_bits_value(input_bytes: int, offset: int = 0, size: int = 8) -> int:
+    """Previous string implementation of bit_helper.extract_bits_value."""
+    value = input_bytes >> offset
+    return value & 2**size - 1
+
+
+def get_bit_address(table: int, offset: int) -> tuple[int, int]:
+    """Previous string implementation of bit_helper.get_bit_address."""
+    return table + int(offset / 8), offset % 8
+
+
+def update_bits(input_byte: int, start_offset: int, value: int | bool, size: int = 1) -> int:
+    """Previous string implementation of bit_helper.update_bits."""
+    input_str = padded_string_byte(input_byte)
+    value_str = padded_string_byte(value, size)
+    if len(value_str) > size:
+        raise ValueError("Value overflowing bits size")
+    reverse_pos = len(input_str) - start_offset
+    output_str = input_str[: reverse_pos - size] + value_str + input_str[reverse_pos:]
+    return int(output_str, 2)
+
+
+def read_value_bytes(
+    ram: bytearray,
+    address: int,
+    offset: int,
+    value_size: int = 1,
+    nb_bytes: int = 1,
+    endian: Literal["little", "big"] = "little",
+) -> int:
+    """Previous string implementation of bit_helper.read_value_bytes, over a RAM buffer."""
+    byte_address, bit_position = get_bit_address(address, offset)
+    if bit_position + value_size > 8 * nb_bytes:
+        return read_value_bytes(ram, address, offset, value_size, nb_bytes + 1, endian)
+    index = byte_address - MEM1_ADDRESS
+    return extract_bits_value(int.from_bytes(ram[index : index + nb_bytes], endian), bit_position, value_size)
+
+
+def set_value_bytes(
+    ram: bytearray,
+    address: int,
+    offset: int,
+    value: int,
+    value_size: int = 1,
+    nb_bytes: int = 1,
+    endian: Literal["little", "big"] = "little",
+) -> None:
+    """Previous string implementation of bit_helper.set_value_bytes, over a RAM buffer."""
+    byte_address, bit_position = get_bit_address(address, offset)
+    if bit_position + value_size > 8 * nb_bytes:
+        set_value_bytes(ram, address, offset, value, value_size, nb_bytes + 1, endian)
+        return
+    index = byte_address - MEM1_ADDRESS
+    cache_byte = int.from_bytes(ram[index : index + nb_bytes], byteorder=endian)
+    updated_byte = update_bits(cache_byte, bit_position, value, value_size)
+    ram[index : index + nb_bytes] = updated_byte.to_bytes(nb_bytes, endian)
+
+
+def set_flag_bit(ram: bytearray, address: int, offset: int, value: bool) -> None:
+    """Previous string implementation of bit_helper.set_flag_bit, over a RAM buffer."""
+    address, bit_position = get_bit_address(address, offset)
+    index = address - MEM1_ADDRESS
+    ram[index] = update_bits(ram[index], bit_position, value)
+
+
+def random_value(rng: random.Random) -> int:
+    """
+    Return a random value of 1, 2 or 4 bytes.
+
+    :param rng: Random generator
+    :return: Random value
+    """
+    return rng.randrange(1 << 8 * rng.choice((1, 2, 4)))
+
+
+class TestBitHelper(unittest.TestCase):
+    """Integer bit helpers give the same results as the previous string implementation."""
+
+    def setUp(self) -> None:
+        self.rng = random.Random(0x5FA)
+
+    def test_extract_bitflag_list(self) -> None:
+        for value in range(0x10000):
+            self.assertEqual(extract_bitflag_list(value), bit_helper.extract_bitflag_list(value), value)
+        for _ in range(SAMPLES):
+            value = random_value(self.rng)
+            self.assertEqual(extract_bitflag_list(value), bit_helper.extract_bitflag_list(value), value)
+
+    def test_extract_bits_value(self) -> None:
+        for _ in range(SAMPLES):
+            value = random_value(self.rng)
+            offset, size = self.rng.randrange(32), self.rng.randrange(1, 17)
+            self.assertEqual(
+                extract_bits_value(value, offset, size), bit_helper.extract_bits_value(value, offset, size)
+            )
+
+    def test_get_bit_address(self) -> None:
+        for offset in range(0x10000):
+            self.assertEqual(get_bit_address(TABLE_ADDRESS, offset), bit_helper.get_bit_address(TABLE_ADDRESS, offset))
+
+    def test_padded_string_byte(self) -> None:
+        for _ in range(SAMPLES):
+            value, padding = random_value(self.rng), self.rng.choice((1, 3, 8, 16))
+            self.assertEqual(padded_string_byte(value, padding), bit_helper.padded_string_byte(value, padding))
+
+    def test_update_bits(self) -> None:
+        for _ in range(SAMPLES):
+            value = random_value(self.rng)
+            size = self.rng.randrange(1, 9)
+            offset = self.rng.randrange(len(padded_string_byte(value)) - size + 1)
+            # One bit wider than the field, so overflowing values are checked too
+            field = self.rng.randrange(1 << size + 1)
+            try:
+                expected = update_bits(value, offset, field, size)
+            except ValueError:
+                with self.assertRaises(ValueError):
+                    bit_helper.update_bits(value, offset, field, size)
+            else:
+                self.assertEqual(expected, bit_helper.update_bits(value, offset, field, size))
+
+
+class TestBitHelperMemory(unittest.TestCase):
+    """Memory helpers leave the fake RAM as the previous string implementation does on a copy of it."""
+
+    def setUp(self) -> None:
+        self.rng = random.Random(0x5FA)
+        self.previous_backend = SHADOW.backend
+        self.backend = FakeBackend()
+        self.backend.hook()
+        SHADOW.backend = self.backend
+        SHADOW.invalidate()
+        start = TABLE_ADDRESS - MEM1_ADDRESS
+        self.backend.ram[start : start + 0x100] = self.rng.randbytes(0x100)
+        self.ram = bytearray(self.backend.ram)
+
+    def tearDown(self) -> None:
+        SHADOW.backend = self.previous_backend
+        SHADOW.invalidate()
+
+    def assertSameRam(self) -> None:
+        start = TABLE_ADDRESS - MEM1_ADDRESS
+        self.assertEqual(self.ram[start : start + 0x100], self.backend.ram[start : start + 0x100])
+
+    def test_set_flag_bit(self) -> None:
+        for _ in range(SAMPLES):
+            offset, value = self.rng.randrange(0x400), self.rng.random() < 0.5
+            set_flag_bit(self.ram, TABLE_ADDRESS, offset, value)
+            bit_helper.set_flag_bit(TABLE_ADDRESS, offset, value)
+            self.assertEqual(
+                read_value_bytes(self.ram, TABLE_ADDRESS, offset), bit_helper.read_flag_bit(TABLE_ADDRESS, offset)
+            )
+        self.assertSameRam()
+
+    def test_value_bytes(self) -> None:
+        for _ in range(SAMPLES):
+            offset, size = self.rng.randrange(0x400), self.rng.randrange(1, 17)
+            nb_bytes, endian = self.rng.choice((1, 2)), self.rng.choice(("little", "big"))
+            self.assertEqual(
+                read_value_bytes(self.ram, TABLE_ADDRESS, offset, size, nb_bytes, endian),
+                bit_helper.read_value_bytes(TABLE_ADDRESS, offset, size, nb_bytes, endian),
+            )
+            byte_address, bit_position = get_bit_address(TABLE_ADDRESS, offset)
+            field_bytes = max(nb_bytes, -(-(bit_position + size) // 8))
+            index = byte_address - MEM1_ADDRESS
+            memory_value = int.from_bytes(self.ram[index : index + field_bytes], endian)
+            if bit_position + size > len(padded_string_byte(memory_value)):
+                # The string implementation only wrote fields inside the significant bytes of the memory value
+                continue
+            value = self.rng.randrange(1 << size)
+            set_value_bytes(self.ram, TABLE_ADDRESS, offset, value, size, nb_bytes, endian)
+            bit_helper.set_value_bytes(TABLE_ADDRESS, offset, value, size, nb_bytes, endian)
+        self.assertSameRam()
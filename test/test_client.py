@@ -0,0 +1,60 @@
+import unittest
+from collections import Counter
+
+from ..addresses import MAIN_MENU_ID
+from ..backends import FakeBackend
+from ..bit_helper import read_value_bytes, set_value_bytes
+from ..items import ITEM_INVENTORY
+from ..memory import SHADOW
+from ..SFAClient import JobState, reconcile_player_state
+
+
+def _job_state(received_items_id: Counter[int]) -> JobState:
+    """
+    Build a client state copy outside any map.
+
+    :param received_items_id: Number of each item ID delivered to the game
+    :return: State copy
+    """
+    return JobState(frozenset(), frozenset(), frozenset(), received_items_id, MAIN_MENU_ID, 0)
+
+
+class TestReconcilePlayerState(unittest.TestCase):
+    """Reconciliation rewrites every item controlled value from the received items."""
+
+    def setUp(self) -> None:
+        self.previous_backend = SHADOW.backend
+        self.backend = FakeBackend()
+        self.backend.hook()
+        SHADOW.backend = self.backend
+        SHADOW.invalidate()
+
+    def tearDown(self) -> None:
+        SHADOW.backend = self.previous_backend
+        SHADOW.invalidate()
+
+    def test_quest_item_not_received_is_reset(self) -> None:
+        for name in ("SHW Alpine Root", "White GrubTub", "DIM Alpine Root"):
+            with self.subTest(name=name):
+                item = ITEM_INVENTORY[name]
+                # Picked up in game without being received from the server
+                set_value_bytes(item.table_address, item.bit_offset, 1, item.bit_size)
+                SHADOW.commit()
+                SHADOW.invalidate()
+                reconcile_player_state(_job_state(Counter()), Counter())
+                SHADOW.commit()
+                SHADOW.invalidate()
+                self.assertEqual(
+                    item.start_amount, read_value_bytes(item.table_address, item.bit_offset, item.bit_size)
+                )
+
+    def test_quest_item_received_is_set(self) -> None:
+        item = ITEM_INVENTORY["White GrubTub"]
+        received_items = Counter({item.id: 2})
+        reconcile_player_state(_job_state(received_items), received_items)
+        SHADOW.commit()
+        SHADOW.invalidate()
+        self.assertEqual(
+            item.start_amount + 2 * item.count_increment,
+            read_value_bytes(item.table_address, item.bit_offset, item.bit_size),
+        )
@@ -0,0 +1,97 @@
+import random
+import unittest
+
+from .. import location_checks
+from ..addresses import T2_ADDRESS
+from ..backends import MEM1_ADDRESS, FakeBackend
+from ..location_checks import LocationChecks
+from ..locations import (
+    NORMAL_TABLES,
+    SFACountLocationData,
+    SFALinkedLocationData,
+    SFALocationType,
+    location_byte_addresses,
+)
+from ..memory import ShadowMemory
+from ..regions import SFARegion
+
+#: Random snapshots evaluated
+SNAPSHOTS = 50
+
+
+def _build_locations() -> list:
+    """
+    Return the client location checks, with count fields over three bytes and map linked flags added.
+
+    :return: Location data
+    """
+    locations = list(NORMAL_TABLES.values())
+    for index in range(8):
+        locations.append(
+            SFACountLocationData(
+                90000 + index, 0x0800 + 3 * index, T2_ADDRESS, SFALocationType.COUNT, SFARegion.TH, 1 << index, 12
+            )
+        )
+    for index in range(8):
+        locations.append(
+            SFALinkedLocationData(
+                91000 + index,
+                0x0900 + index,
+                T2_ADDRESS,
+                SFALocationType.FLAG,
+                SFARegion.TH,
+                0,
+                T2_ADDRESS + 0x200 + index,
+                1 + index % 4,
+                index,
+            )
+        )
+    return locations
+
+
+class TestLocationChecks(unittest.TestCase):
+    """Vectorized and row by row evaluations return the same locations."""
+
+    def setUp(self) -> None:
+        self.rng = random.Random(0x5FA)
+        self.locations = _build_locations()
+        regions = [(address, 1) for location in self.locations for address in location_byte_addresses(location)]
+        self.memory = ShadowMemory(FakeBackend(), regions)
+        self.memory.backend.hook()
+        self.checks = LocationChecks(self.locations, self.memory)
+        self.server_locations = {location.id for location in self.locations}
+
+    def randomize(self) -> None:
+        """Fill the watched memory with random bytes, mostly zero so map values match."""
+        for address, size in self.memory.spans:
+            index = address - MEM1_ADDRESS
+            for offset in range(size):
+                self.memory.backend.ram[index + offset] = self.rng.choice((0, 0, 0, self.rng.randrange(256)))
+        self.memory.refresh()
+
+    def assertSameEvaluation(self, locations_checked: set[int], rows: list[int] | None = None) -> None:
+        expected = self.checks._evaluate_rows(self.memory.buffer, self.server_locations, locations_checked, rows)
+        result = self.checks._evaluate_vectorized(self.memory.buffer, self.server_locations, locations_checked, rows)
+        self.assertEqual([location.id for location in expected], [location.id for location in result])
+
+    @unittest.skipIf(location_checks.np is None, "NumPy is not installed")
+    def test_evaluate(self) -> None:
+        for _ in range(SNAPSHOTS):
+            self.randomize()
+            locations_checked = set(self.rng.sample(sorted(self.server_locations), 20))
+            self.assertSameEvaluation(locations_checked)
+            rows = sorted(self.rng.sample(range(len(self.locations)), 30))
+            self.assertSameEvaluation(locations_checked, rows)
+
+    @unittest.skipIf(location_checks.np is None, "NumPy is not installed")
+    def test_checked_set_changes(self) -> None:
+        self.randomize()
+        location_ids = sorted(self.server_locations)
+        self.rng.shuffle(location_ids)
+        locations_checked = set(location_ids[:20])
+        self.assertSameEvaluation(locations_checked)
+        # Same set object and size but different content, the cached sorted array must not be reused
+        for location_id in location_ids[20:]:
+            locations_checked.remove(self.rng.choice(sorted(locations_checked)))
+            locations_checked.add(location_id)
+            self.assertSameEvaluation(locations_checked)
@@ -0,0 +1,48 @@
+"""
+Time the bit helpers per call against the previous string implementation.
+
+Run from the Archipelago folder: python -m worlds.sfa.tools.bench_bit_helper
+"""
+
+import timeit
+
+from .. import bit_helper
+from ..test import test_bit_helper as string_helper
+
+#: Calls timed per repeat
+NUMBER = 100000
+#: Repeats, the fastest one is reported
+REPEAT = 5
+
+#: Function name and arguments of each timed call
+CALLS = (
+    ("extract_bitflag_list", (0xA5,)),
+    ("extract_bitflag_list", (0x12345678,)),
+    ("extract_bits_value", (0x12345678, 9, 5)),
+    ("get_bit_address", (0x803A32CC, 0x0945)),
+    ("padded_string_byte", (0x05,)),
+    ("update_bits", (0xA5, 3, 1)),
+    ("update_bits", (0xA5, 2, 5, 3)),
+)
+
+
+def time_call(function, args: tuple) -> float:
+    """
+    Time a function call.
+
+    :param function: Function to call
+    :param args: Arguments of the call
+    :return: Nanoseconds per call, fastest of the repeats
+    """
+    return min(timeit.repeat(lambda: function(*args), number=NUMBER, repeat=REPEAT)) / NUMBER * 1e9
+
+
+def main() -> None:
+    for name, args in CALLS:
+        before = time_call(getattr(string_helper, name), args)
+        after = time_call(getattr(bit_helper, name), args)
+        print(f"{name}{args}: {before:.0f} ns -> {after:.0f} ns ({before / after:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
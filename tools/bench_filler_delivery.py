@@ -0,0 +1,61 @@
+"""
+Deliver 10,000 filler items to the fake backend, one item per tick and as a single backlog.
+
+Run from the Archipelago folder: python -m worlds.sfa.tools.bench_filler_delivery
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+from NetUtils import NetworkItem
+
+from .. import SFAClient
+from ..backends import FakeBackend
+from ..items import FILLER_ITEMS
+from ..memory import SHADOW
+from ..memory_worker import PRIORITY_DELIVERY
+
+#: Filler items delivered
+ITEMS = 10000
+
+
+async def deliver(items: list[NetworkItem], per_tick: int) -> tuple[float, int]:
+    """
+    Deliver items through the client delivery path, as they arrive from the server.
+
+    :param items: Items to deliver
+    :param per_tick: Items received between two ticks
+    :return: Seconds taken, number of items delivered
+    """
+    ctx = SFAClient.SFAContext(None, None)
+    ctx.memory_worker.start()
+    try:
+        start = time.perf_counter()
+        for index in range(0, len(items), per_tick):
+            ctx.items_received.extend(items[index : index + per_tick])
+            await SFAClient.memory_job(ctx, PRIORITY_DELIVERY, SFAClient._begin_tick)
+            await SFAClient.give_items(ctx)
+            await SFAClient.memory_job(ctx, PRIORITY_DELIVERY, SHADOW.commit)
+        return time.perf_counter() - start, ctx.expected_idx
+    finally:
+        ctx.memory_worker.stop()
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    backend = FakeBackend()
+    backend.hook()
+    SHADOW.backend = backend
+    rng = random.Random(0x5FA)
+    filler_ids = [item.id for item in FILLER_ITEMS.values()]
+    items = [NetworkItem(rng.choice(filler_ids), 0, 0) for _ in range(ITEMS)]
+    for per_tick in (1, ITEMS):
+        seconds, delivered = asyncio.run(deliver(items, per_tick))
+        per_item = seconds / delivered * 1e6
+        print(f"{delivered} items, {per_tick} per tick: {seconds * 1000:.1f} ms, {per_item:.1f} us per item")
+
+
+if __name__ == "__main__":
+    main()
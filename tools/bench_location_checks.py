@@ -0,0 +1,61 @@
+"""
+Time the vectorized and pure Python location checks at ten times the client table size.
+
+Run from the Archipelago folder: python -m worlds.sfa.tools.bench_location_checks
+"""
+
+import dataclasses
+import random
+import timeit
+
+from ..backends import MEM1_ADDRESS, FakeBackend
+from ..location_checks import LocationChecks, np
+from ..locations import NORMAL_TABLES, location_byte_addresses
+from ..memory import ShadowMemory
+
+#: Copies of the client location table
+TABLE_COPIES = 10
+#: Evaluations timed per repeat
+NUMBER = 1000
+#: Repeats, the fastest one is reported
+REPEAT = 5
+
+
+def main() -> None:
+    rng = random.Random(0x5FA)
+    locations = [
+        dataclasses.replace(location, id=location.id + 100000 * copy)
+        for copy in range(TABLE_COPIES)
+        for location in NORMAL_TABLES.values()
+    ]
+    regions = [(address, 1) for location in locations for address in location_byte_addresses(location)]
+    memory = ShadowMemory(FakeBackend(), regions)
+    memory.backend.hook()
+    for address, size in memory.spans:
+        index = address - MEM1_ADDRESS
+        memory.backend.ram[index : index + size] = rng.randbytes(size)
+    memory.refresh()
+    checks = LocationChecks(locations, memory)
+    server_locations = {location.id for location in locations}
+    locations_checked = set(rng.sample(sorted(server_locations), len(server_locations) // 4))
+
+    evaluations = [("python", checks._evaluate_rows)]
+    if np is not None:
+        evaluations.append(("numpy", checks._evaluate_vectorized))
+    else:
+        print("NumPy is not installed, only the pure Python evaluation is timed")
+    print(f"{len(locations)} locations, {len(memory.buffer)} watched bytes")
+    for name, evaluate in evaluations:
+        satisfied = evaluate(memory.buffer, server_locations, locations_checked, None)
+        seconds = min(
+            timeit.repeat(
+                lambda evaluate=evaluate: evaluate(memory.buffer, server_locations, locations_checked, None),
+                number=NUMBER,
+                repeat=REPEAT,
+            )
+        )
+        print(f"{name}: {seconds / NUMBER * 1e6:.1f} us per full evaluation, {len(satisfied)} satisfied")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Time the item and location lookups by ID against the linear scans they replace.
+
+Run from the Archipelago folder: python -m worlds.sfa.tools.bench_lookups
+"""
+
+import timeit
+
+from ..items import ALL_ITEMS_TABLE, SFAItemData
+from ..locations import LINKED_LOCATIONS_BY_ITEM, LOCATION_SHOP, LOCATION_TABLE, LOCATION_UPGRADE, SFALocationData
+
+#: Lookup rounds over all IDs per repeat
+NUMBER = 1000
+#: Repeats, the fastest one is reported
+REPEAT = 5
+
+
+def scan_item(id: int) -> SFAItemData | None:
+    """Previous SFAItemData.get_by_id, scanning the item table."""
+    for item in ALL_ITEMS_TABLE.values():
+        if item.id == id:
+            return item
+    return None
+
+
+def scan_location(id: int) -> SFALocationData | None:
+    """Location lookup by scanning the location table, there was no lookup before."""
+    for location in LOCATION_TABLE.values():
+        if location.id == id:
+            return location
+    return None
+
+
+def scan_linked_locations(item_id: int) -> tuple[SFALocationData, ...]:
+    """Upgrade and shop locations sharing the flag of an item, by scanning both tables."""
+    return tuple(
+        location
+        for location in [*LOCATION_UPGRADE.values(), *LOCATION_SHOP.values()]
+        if location.linked_item == item_id
+    )
+
+
+def time_lookups(function, ids: list[int]) -> float:
+    """
+    Time lookups of all IDs.
+
+    :param function: Lookup function
+    :param ids: IDs to look up
+    :return: Nanoseconds per lookup, fastest of the repeats
+    """
+    seconds = min(timeit.repeat(lambda: [function(id) for id in ids], number=NUMBER, repeat=REPEAT))
+    return seconds / NUMBER / len(ids) * 1e9
+
+
+def main() -> None:
+    item_ids = [item.id for item in ALL_ITEMS_TABLE.values()]
+    location_ids = [location.id for location in LOCATION_TABLE.values()]
+    lookups = (
+        ("item by ID", scan_item, SFAItemData.get_by_id, item_ids),
+        ("location by ID", scan_location, SFALocationData.get_by_id, location_ids),
+        (
+            "linked locations by item ID",
+            scan_linked_locations,
+            lambda id: LINKED_LOCATIONS_BY_ITEM.get(id, ()),
+            item_ids,
+        ),
+    )
+    for name, scan, index, ids in lookups:
+        assert all(scan(id) == index(id) for id in ids), name
+        before, after = time_lookups(scan, ids), time_lookups(index, ids)
+        print(f"{name}, {len(ids)} IDs: {before:.0f} ns -> {after:.0f} ns per lookup ({before / after:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Replay a 2,000-item release on the fake backend, delivered in one tick or one item per tick.
+
+Run from the Archipelago folder: python -m worlds.sfa.tools.bench_release
+"""
+
+import asyncio
+import logging
+import random
+import time
+
+from NetUtils import NetworkItem
+
+from .. import SFAClient
+from ..addresses import PLAYER_CUR_HP, PLAYER_CUR_MP, PLAYER_MAX_HP, PLAYER_MAX_MP, T0_ADDRESS
+from ..backends import MEM1_ADDRESS, FakeBackend, RetryBackend
+from ..items import ALL_ITEMS_TABLE
+from ..memory import SHADOW
+from ..memory_worker import PRIORITY_DELIVERY
+
+#: Items in the release
+RELEASE_ITEMS = 2000
+
+
+def reset_memory(backend: FakeBackend, seed: int) -> None:
+    """
+    Fill the game tables with random bytes, with room left for health and magic refills.
+
+    :param backend: Fake backend
+    :param seed: Random seed
+    """
+    rng = random.Random(seed)
+    # From the player values to the end of the flag tables
+    start, end = PLAYER_CUR_HP - MEM1_ADDRESS, T0_ADDRESS + 0x100 - MEM1_ADDRESS
+    backend.ram[start:end] = rng.randbytes(end - start)
+    for address, value in ((PLAYER_MAX_HP, 0x20), (PLAYER_CUR_HP, 0x04), (PLAYER_MAX_MP, 0x40), (PLAYER_CUR_MP, 0x01)):
+        backend.ram[address - MEM1_ADDRESS] = value
+
+
+async def release(items: list[NetworkItem], per_tick: int) -> tuple[float, int, int, int]:
+    """
+    Deliver released items through the client delivery path.
+
+    :param items: Released items
+    :param per_tick: Items delivered per tick
+    :return: Seconds taken, number of items delivered, backend read calls, backend write calls
+    """
+    ctx = SFAClient.SFAContext(None, None)
+    ctx.stored_map = 0x07
+    ctx.memory_worker.start()
+    try:
+        reads, writes = SFAClient._backend_calls()
+        start = time.perf_counter()
+        for index in range(0, len(items), per_tick):
+            ctx.items_received.extend(items[index : index + per_tick])
+            await SFAClient.memory_job(ctx, PRIORITY_DELIVERY, SFAClient._begin_tick)
+            await SFAClient.give_items(ctx)
+            await SFAClient.memory_job(ctx, PRIORITY_DELIVERY, SHADOW.commit)
+        seconds = time.perf_counter() - start
+        total_reads, total_writes = SFAClient._backend_calls()
+        return seconds, ctx.expected_idx, total_reads - reads, total_writes - writes
+    finally:
+        ctx.memory_worker.stop()
+
+
+def main() -> None:
+    logging.disable(logging.CRITICAL)
+    backend = FakeBackend()
+    backend.hook()
+    SHADOW.backend = RetryBackend(backend)
+    rng = random.Random(0x5FA)
+    item_ids = [item.id for item in ALL_ITEMS_TABLE.values() if item.id != SFAClient.VICTORY_ITEM_ID]
+    # Releases are mostly filler
+    weights = [20 if item_id in (1001, 1002, 1003) else 1 for item_id in item_ids]
+    items = [NetworkItem(item_id, 0, 0) for item_id in rng.choices(item_ids, weights, k=RELEASE_ITEMS)]
+    print(f"{RELEASE_ITEMS} items, {len(set(item.item for item in items))} distinct")
+    memory = {}
+    for per_tick in (RELEASE_ITEMS, 1):
+        reset_memory(backend, 0x5FA)
+        seconds, delivered, reads, writes = asyncio.run(release(items, per_tick))
+        memory[per_tick] = bytes(backend.ram)
+        print(
+            f"{per_tick} per tick: {delivered} delivered in {seconds * 1000:.1f} ms, "
+            f"{reads} backend reads, {writes} backend writes"
+        )
+    if memory[1] != memory[RELEASE_ITEMS]:
+        print("Memory differs between the two deliveries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from collections.abc import Callable
+from typing import Any
+
+#: Handler called with the client state, the previous value and the new value
+TransitionHandler = Callable[[Any, int, int], None]
+
+
+class TransitionBus:
+    """
+    Dispatch transitions of a game value, such as the current map, to handlers registered by value.
+
+    Handlers run only when the value changes, so watching a value costs a single compare per tick.
+    """
+
+    def __init__(self):
+        """Initialize the bus without handlers."""
+        self._enter: dict[int, list[TransitionHandler]] = {}
+        self._leave: dict[int, list[TransitionHandler]] = {}
+        self._enter_other: list[TransitionHandler] = []
+
+    def on_enter(self, *values: int) -> Callable[[TransitionHandler], TransitionHandler]:
+        """
+        Register a handler called when entering any of the values.
+
+        :param values: Values entered
+        :return: Decorator registering the handler
+        """
+
+        def register(handler: TransitionHandler) -> TransitionHandler:
+            for value in values:
+                self._enter.setdefault(value, []).append(handler)
+            return handler
+
+        return register
+
+    def on_leave(self, *values: int) -> Callable[[TransitionHandler], TransitionHandler]:
+        """
+        Register a handler called when leaving any of the values.
+
+        :param values: Values left
+        :return: Decorator registering the handler
+        """
+
+        def register(handler: TransitionHandler) -> TransitionHandler:
+            for value in values:
+                self._leave.setdefault(value, []).append(handler)
+            return handler
+
+        return register
+
+    def on_enter_other(self, handler: TransitionHandler) -> TransitionHandler:
+        """
+        Register a handler called when entering a value without enter handlers.
+
+        :param handler: Handler to register
+        :return: The handler
+        """
+        self._enter_other.append(handler)
+        return handler
+
+    def emit(self, state: Any, previous: int, current: int) -> None:
+        """
+        Run the leave handlers of the previous value, then the enter handlers of the new value.
+
+        :param state: Client state read by the handlers
+        :param previous: Previous value
+        :param current: New value
+        """
+        for handler in self._leave.get(previous, ()):
+            handler(state, previous, current)
+        for handler in self._enter.get(current) or self._enter_other:
+            handler(state, previous, current)